@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmarks whole builds of a synthetic project and compares them against
+a stored baseline.
+
+Each run happens in a new process, which does a cold build (empty template
+cache, nothing parsed yet) followed by a warm build with the same Builder.
+Recorded are wall times of each build and its phases, number of files
+written and their total size. Peak memory allocated by each build, on top
+of memory in use before it, is traced with tracemalloc in another process
+doing the same builds, so tracing does not slow down the timed ones.
+
+Usage: python benchmarks/build_benchmark.py [--runs N] [--baseline FILE]
+    [--save-baseline] [--threshold FRACTION] [--streaming] [generator options]
+
+Exits with code 1 if the cold or warm build time is slower than the baseline
+by more than the threshold (defaults to 0.2, i.e. 20%).
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BENCHMARKS_DIR = os.path.dirname(os.path.realpath(__file__))
+GMDOC_DIR = os.path.join(BENCHMARKS_DIR, "..")
+
+sys.path.insert(0, GMDOC_DIR)
+
+from generate_project import generate
+
+
+RUN = """
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, sys.argv[1])
+
+from src.builder import Builder
+
+project_dir, out_dir, cache_dir, streaming, trace = sys.argv[2:7]
+builder = Builder(log=None, cache_dir=cache_dir)
+options = {"streaming": streaming == "1"}
+
+if trace == "1":
+    tracemalloc.start()
+
+def measure():
+    if trace == "1":
+        # Peak of this build only, not of the whole process, on top of
+        # memory kept from before it (e.g. caches of the Builder)
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        builder.build(project_dir, out_dir, options)
+        return {"peak_kb": (tracemalloc.get_traced_memory()[1] - before) / 1024}
+
+    result = builder.build(project_dir, out_dir, options)
+    files = 0
+    size = 0
+    for root, _, names in os.walk(out_dir):
+        for name in names:
+            files += 1
+            size += os.path.getsize(os.path.join(root, name))
+    return {
+        "time": result.time,
+        "phases": result.phases,
+        "files": files,
+        "bytes": size,
+    }
+
+print(json.dumps({"cold": measure(), "warm": measure()}))
+"""
+
+
+def _run(project_dir, work_dir, streaming, trace):
+    out_dir = os.path.join(work_dir, "out")
+    cache_dir = tempfile.mkdtemp(dir=work_dir)
+    output = subprocess.check_output([
+        sys.executable, "-c", RUN, GMDOC_DIR,
+        project_dir, out_dir, cache_dir, "1" if streaming else "0", "1" if trace else "0"])
+    return json.loads(output)
+
+
+def run_once(project_dir, work_dir, streaming):
+    """ Times cold and warm builds, then traces their memory in another
+    process. """
+    result = _run(project_dir, work_dir, streaming, False)
+    traced = _run(project_dir, work_dir, streaming, True)
+    for name in ["cold", "warm"]:
+        result[name].update(traced[name])
+    return result
+
+
+def summarize(runs):
+    """ Takes medians of all numbers across runs. """
+    def _median(values):
+        first = values[0]
+        if isinstance(first, dict):
+            return {k: _median([v[k] for v in values]) for k in first}
+        return statistics.median(values)
+    return _median(runs)
+
+
+def print_build(name, build):
+    print("{} build: {:.3f}s, peak memory {:.1f} MiB, {} files, {:.1f} MiB".format(
+        name, build["time"], build["peak_kb"] / 1024, build["files"],
+        build["bytes"] / 1024 / 1024))
+    for phase, t in build["phases"].items():
+        print("  {:<10} {:.3f}s".format(phase, t))
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--runs", type=int, default=3)
+    argparser.add_argument("--baseline", default=os.path.join(BENCHMARKS_DIR, "build_baseline.json"))
+    argparser.add_argument("--save-baseline", action="store_true")
+    argparser.add_argument("--threshold", type=float, default=0.2)
+    argparser.add_argument("--streaming", action="store_true")
+    argparser.add_argument("--scripts", type=int, default=50)
+    argparser.add_argument("--constructors", type=int, default=10)
+    argparser.add_argument("--enums", type=int, default=5)
+    argparser.add_argument("--members", type=int, default=10)
+    argparser.add_argument("--density", type=float, default=0.8)
+    args = argparser.parse_args()
+
+    config = {
+        "scripts": args.scripts,
+        "constructors": args.constructors,
+        "enums": args.enums,
+        "members": args.members,
+        "density": args.density,
+        "streaming": args.streaming,
+    }
+
+    work_dir = tempfile.mkdtemp(prefix="gmdoc-bench-")
+    try:
+        project_dir = os.path.join(work_dir, "project")
+        generate(project_dir, args.scripts, args.constructors, args.enums,
+                 args.members, args.density)
+        runs = [run_once(project_dir, work_dir, args.streaming) for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    result = summarize(runs)
+    result["config"] = config
+
+    print_build("Cold", result["cold"])
+    print_build("Warm", result["warm"])
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print("Saved baseline to", args.baseline)
+        exit(0)
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found, run with --save-baseline to create one.")
+        exit(0)
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+
+    if baseline.get("config") != config:
+        print("WARNING: Baseline was recorded with a different configuration!")
+
+    failed = False
+    for name in ["cold", "warm"]:
+        t = result[name]["time"]
+        t_base = baseline[name]["time"]
+        slowdown = t / t_base - 1.0 if t_base else 0.0
+        ok = slowdown <= args.threshold
+        failed = failed or not ok
+        print("{} build: {:.3f}s vs baseline {:.3f}s ({:+.1f}%) {}".format(
+            name.capitalize(), t, t_base, slowdown * 100, "OK" if ok else "FAILED"))
+
+    if failed:
+        print("Build performance degraded!")
+        exit(1)
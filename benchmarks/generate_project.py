@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Generates a synthetic GMS2.3 project for benchmarking builds.
+
+Usage: python benchmarks/generate_project.py OUTPUT_DIR [--scripts N]
+    [--constructors N] [--enums N] [--members N] [--density FRACTION]
+    [--seed N]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+
+from src.meta import Meta
+
+
+WORDS = (
+    "the a of to and in is it for on with as at by from this that "
+    "surface sprite vertex buffer camera matrix shader texture model "
+    "animation bone light render frame draw update create destroy"
+).split()
+
+PREFIX = "GMD_"
+
+
+def lorem(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def make_docs(rng, density, lines):
+    """ Returns documentation lines, or an empty list if the item is chosen to
+    be undocumented. """
+    if rng.random() >= density:
+        return []
+    return ["/// " + l for l in lines]
+
+
+def make_function(rng, name, density, indent="", method=False):
+    args = ["_arg{}".format(i) for i in range(rng.randint(0, 4))]
+    docs = make_docs(rng, density, [
+        "@func {}({})".format(name, ", ".join(args)),
+        "@desc " + lorem(rng, rng.randint(5, 40)),
+    ] + [
+        "@param {{real}} {} {}".format(a, lorem(rng, rng.randint(3, 12))) for a in args
+    ] + [
+        "@return {real} " + lorem(rng, 6),
+    ])
+    if method:
+        head = "static {} = function ({}) {{".format(name, ", ".join(args))
+        tail = "};"
+    else:
+        head = "function {}({}) {{".format(name, ", ".join(args))
+        tail = "}"
+    body = [
+        "var _sum = 0;",
+        "for (var i = 0; i < {}; ++i)".format(rng.randint(1, 100)),
+        "{",
+        "    if (i mod 2 == 0) { _sum += i; } else { _sum -= \"str\" == \"str\"; }",
+        "}",
+        "return _sum;",
+    ]
+    lines = docs + [head] + ["    " + l for l in body] + [tail]
+    return [indent + l for l in lines]
+
+
+def make_constructor(rng, name, members, density):
+    lines = make_docs(rng, density, [
+        "@func {}()".format(name),
+        "@desc " + lorem(rng, rng.randint(10, 60)),
+    ])
+    lines.append("function {}() constructor {{".format(name))
+    for i in range(members):
+        if i % 2:
+            lines += ["    " + l for l in make_docs(rng, density, ["@var {real} " + lorem(rng, 8)])]
+            lines.append("    prop{} = {};".format(i, i))
+        else:
+            lines += make_function(rng, "method{}".format(i), density,
+                                   indent="    ", method=True)
+    lines.append("}")
+    return lines
+
+
+def make_enum(rng, name, members, density):
+    lines = make_docs(rng, density, ["@enum " + lorem(rng, 8)])
+    lines += ["enum {}".format(name), "{"]
+    for i in range(members):
+        lines += ["    " + l for l in make_docs(rng, 1.0, ["@member " + lorem(rng, 6)])]
+        lines.append("    Member{},".format(i))
+    lines.append("};")
+    return lines
+
+
+def generate(out_dir, scripts=50, constructors=10, enums=5, members=10, density=0.8, seed=0):
+    rng = random.Random(seed)
+    project_name = "Benchmark"
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    resources = []
+
+    def write_script(name, lines):
+        script_dir = os.path.join(out_dir, "scripts", name)
+        os.makedirs(script_dir, exist_ok=True)
+        with open(os.path.join(script_dir, name + ".gml"), "w") as f:
+            f.write("\n".join(lines) + "\n")
+        with open(os.path.join(script_dir, name + ".yy"), "w") as f:
+            json.dump({
+                "isDnD": False,
+                "isCompatibility": False,
+                "parent": {"name": "Scripts", "path": "folders/Scripts.yy"},
+                "resourceVersion": "1.0",
+                "name": name,
+                "tags": [],
+                "resourceType": "GMScript",
+            }, f, indent=2)
+        resources.append({"id": {"name": name, "path": "scripts/{0}/{0}.yy".format(name)}})
+
+    for i in range(scripts):
+        name = "{}func_{}".format(PREFIX, i)
+        write_script(name, make_function(rng, name, density))
+
+    for i in range(constructors):
+        name = "{}Struct{}".format(PREFIX, i)
+        write_script(name, make_constructor(rng, name, members, density))
+
+    for i in range(enums):
+        name = "{}EEnum{}".format(PREFIX, i)
+        write_script(name, make_enum(rng, name, members, density))
+
+    with open(os.path.join(out_dir, project_name + ".yyp"), "w") as f:
+        json.dump({
+            "resources": resources,
+            "resourceVersion": "1.4",
+            "name": project_name,
+            "resourceType": "GMProject",
+        }, f, indent=2)
+
+    meta = Meta(
+        project=project_name + ".yyp",
+        project_name=project_name,
+        title=project_name + " Docs",
+        author="GMDoc",
+        prefix=PREFIX,
+        toc={project_name + " Docs": "index.md"})
+    meta.save(os.path.join(out_dir, "gmdoc.json"))
+
+    docs_src_dir = os.path.join(out_dir, "docs_src")
+    os.makedirs(docs_src_dir, exist_ok=True)
+    with open(os.path.join(docs_src_dir, "index.md"), "w") as f:
+        f.write("# {}\n\n{}\n".format(project_name, lorem(rng, 50)))
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("out_dir")
+    argparser.add_argument("--scripts", type=int, default=50)
+    argparser.add_argument("--constructors", type=int, default=10)
+    argparser.add_argument("--enums", type=int, default=5)
+    argparser.add_argument("--members", type=int, default=10)
+    argparser.add_argument("--density", type=float, default=0.8)
+    argparser.add_argument("--seed", type=int, default=0)
+    args = argparser.parse_args()
+
+    generate(args.out_dir, args.scripts, args.constructors, args.enums,
+             args.members, args.density, args.seed)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Measures memory taken by the parsed documentation model of a project.
+
+All scripts of a synthetic project (or of an existing one, with --project)
+are parsed and kept in memory, like the Builder does between builds.
+Recorded are the number of nodes of the model by type, memory still
+allocated after parsing (tokens are freed by then, so this is the model
+itself), peak memory during parsing and the total parse time (measured
+in a separate pass, since tracing allocations slows parsing down).
+
+Usage: python benchmarks/model_memory.py [--project DIR] [generator options]
+"""
+import argparse
+import collections
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCHMARKS_DIR = os.path.dirname(os.path.realpath(__file__))
+GMDOC_DIR = os.path.join(BENCHMARKS_DIR, "..")
+
+sys.path.insert(0, GMDOC_DIR)
+
+from generate_project import generate
+from src.builder import iter_resources
+from src.meta import Meta
+from src.parser import Scope
+
+
+def count_nodes(scripts):
+    counts = collections.Counter()
+    stack = list(scripts)
+    while stack:
+        entity = stack.pop()
+        counts[type(entity).__name__] += 1
+        if isinstance(entity, Scope):
+            stack += entity.children
+    return counts
+
+
+def measure(project_dir):
+    meta = Meta.load(os.path.join(project_dir, "gmdoc.json"), interactive=False)
+
+    start = time.perf_counter()
+    scripts = [s for _, s in iter_resources(project_dir, meta.prefix, log=lambda *args: None)]
+    elapsed = time.perf_counter() - start
+    del scripts
+
+    tracemalloc.start()
+    scripts = [s for _, s in iter_resources(project_dir, meta.prefix, log=lambda *args: None)]
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return scripts, current, peak, elapsed
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--project")
+    argparser.add_argument("--scripts", type=int, default=500)
+    argparser.add_argument("--constructors", type=int, default=100)
+    argparser.add_argument("--enums", type=int, default=50)
+    argparser.add_argument("--members", type=int, default=20)
+    argparser.add_argument("--density", type=float, default=0.8)
+    argparser.add_argument("--seed", type=int, default=0)
+    args = argparser.parse_args()
+
+    work_dir = None
+    project_dir = args.project
+    if not project_dir:
+        work_dir = tempfile.mkdtemp(prefix="gmdoc-memory-")
+        project_dir = work_dir
+        generate(project_dir, args.scripts, args.constructors, args.enums,
+                 args.members, args.density, args.seed)
+
+    try:
+        scripts, current, peak, elapsed = measure(project_dir)
+    finally:
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    counts = count_nodes(scripts)
+    total = sum(counts.values())
+    print("Scripts: {}".format(len(scripts)))
+    print("Nodes: {} ({})".format(total, ", ".join(
+        "{} {}".format(n, t) for t, n in counts.most_common())))
+    print("Model: {:.1f} MiB ({:.0f} B per node)".format(current / 1048576, current / max(total, 1)))
+    print("Peak while parsing: {:.1f} MiB".format(peak / 1048576))
+    print("Parse time: {:.2f}s".format(elapsed))
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Measures sustained throughput of the page rating server.
+
+The server runs in this process with a fresh database. Clients run in
+separate processes, each with several threads sending ratings over
+keep-alive connections, encoded the same way as by the rating form. Every
+submission waits for its rating to be committed, so the result is the
+number of durably stored ratings per second.
+
+Usage: python benchmarks/rating_benchmark.py [--processes N] [--threads N]
+    [--duration SECONDS] [--batch-size N] [--pages N]
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.realpath(__file__))
+GMDOC_DIR = os.path.join(BENCHMARKS_DIR, "..")
+
+sys.path.insert(0, GMDOC_DIR)
+
+from src.rating import RatingStore, make_server
+
+
+BOUNDARY = "----gmdocbenchmark"
+
+
+def encode_rating(page, like, message):
+    body = ""
+    for name, value in [("like", like), ("message", message), ("page", page)]:
+        body += (
+            "--{}\r\n"
+            "Content-Disposition: form-data; name=\"{}\"\r\n\r\n"
+            "{}\r\n").format(BOUNDARY, name, value)
+    body += "--{}--\r\n".format(BOUNDARY)
+    return body.encode("utf-8")
+
+
+def run_client(args):
+    """ Sends ratings from `threads` threads until `deadline` and returns a
+    list of latencies of successful submissions and a number of errors. """
+    port, threads, deadline, pages, seed = args
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def _thread(i):
+        rng = random.Random(seed * 1000 + i)
+        conn = http.client.HTTPConnection("localhost", port)
+        headers = {"Content-Type": "multipart/form-data; boundary=" + BOUNDARY}
+        local = []
+        failed = 0
+        while time.time() < deadline:
+            body = encode_rating(
+                "https://example.com/docs/Page{}.html".format(rng.randrange(pages)),
+                rng.choice(["+1", "-1"]),
+                rng.choice(["", "Great page!", "Could use an example."]))
+            start = time.perf_counter()
+            try:
+                conn.request("POST", "/", body, headers)
+                response = conn.getresponse()
+                response.read()
+                if response.status == 200:
+                    local.append(time.perf_counter() - start)
+                else:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection("localhost", port)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    workers = [threading.Thread(target=_thread, args=(i,)) for i in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return latencies, errors[0]
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--processes", type=int, default=4)
+    argparser.add_argument("--threads", type=int, default=8)
+    argparser.add_argument("--duration", type=float, default=5.0)
+    argparser.add_argument("--batch-size", type=int, default=256)
+    argparser.add_argument("--pages", type=int, default=100)
+    args = argparser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="gmdoc-rating-")
+    store = RatingStore(os.path.join(work_dir, "ratings.sqlite"), args.batch_size)
+    server = make_server(store, port=0, log=None)
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        deadline = time.time() + args.duration
+        with multiprocessing.Pool(args.processes) as pool:
+            results = pool.map(run_client, [
+                (port, args.threads, deadline, args.pages, i)
+                for i in range(args.processes)])
+        server.shutdown()
+        store.close()
+
+        latencies = sorted(l for r in results for l in r[0])
+        errors = sum(r[1] for r in results)
+        stored = store.count()
+    finally:
+        server.server_close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("Clients: {} processes x {} threads, batch size {}".format(
+        args.processes, args.threads, args.batch_size))
+    print("Submitted {} ratings in {:.1f}s ({:.0f}/s), {} errors".format(
+        len(latencies), args.duration, len(latencies) / args.duration, errors))
+    if latencies:
+        print("Latency: median {:.2f} ms, p99 {:.2f} ms".format(
+            statistics.median(latencies) * 1000,
+            latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000))
+    print("Stored {} ratings".format(stored))
+
+    if stored != len(latencies):
+        print("Number of stored ratings does not match!")
+        exit(1)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Tokenizes adversarial inputs (huge and unterminated comments, long
+escape runs, unterminated strings) of increasing sizes and fails if the
+tokenizer does not scale linearly or its throughput is too low.
+
+Usage: python benchmarks/tokenizer_adversarial.py [--size CHARS] [--min-throughput CHARS_PER_SEC]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+
+from src.tokenizer import Tokenizer, TokenizationError
+
+
+CASES = {
+    "huge block comment": lambda n: "/*" + "x" * n + "*/",
+    "unterminated block comment": lambda n: "/*" + "x" * n,
+    "many block comments": lambda n: "/* c */ a = 1;\n" * (n // 15),
+    "huge doc comment": lambda n: "///" + " @desc" * (n // 6) + "\n",
+    "long escape run": lambda n: "\"" + "\\\"" * (n // 2) + "\"",
+    "verbatim string": lambda n: "@\"" + "\\\n" * (n // 2) + "\"",
+    "unterminated string": lambda n: "a = \"" + "\\\"" * (n // 2) + "\n",
+    "unterminated verbatim string": lambda n: "a = @\"" + "x" * n,
+}
+
+SCALE = 4
+""" How many times larger is the second input of each case. """
+
+MAX_RATIO = 8.0
+""" Maximum allowed ratio of times of tokenizing inputs of size SCALE * n and
+n. Linear tokenization has a ratio of about 4, quadratic of about 16. """
+
+
+def measure(code, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            Tokenizer().tokenize(code)
+        except TokenizationError:
+            pass
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--size", type=int, default=100000)
+    argparser.add_argument("--min-throughput", type=float, default=100000.0)
+    args = argparser.parse_args()
+
+    failed = False
+
+    for name, make in CASES.items():
+        small = make(args.size)
+        large = make(args.size * SCALE)
+        time_small = measure(small)
+        time_large = measure(large)
+        ratio = time_large / max(time_small, 1e-9)
+        throughput = len(large) / max(time_large, 1e-9)
+
+        ok = ratio <= MAX_RATIO and throughput >= args.min_throughput
+        failed = failed or not ok
+
+        print("{:<30} {:>12.0f} chars/s  ratio {:>5.2f}  {}".format(
+            name, throughput, ratio, "OK" if ok else "FAILED"))
+
+    if failed:
+        print("Tokenizer throughput degraded!")
+        exit(1)
@@ -4,7 +4,8 @@ import os
 import sys
 import traceback
 
-from src.targets import HelpTarget, InitTarget, BuildTarget
+from src.targets import HelpTarget, InitTarget, BuildTarget, BuildAllTarget, CheckLinksTarget, ExportTarget, RatingServerTarget, \
+    CheckTarget, QueryTarget
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
@@ -17,6 +18,12 @@ if __name__ == "__main__":
         "help": HelpTarget,
         "init": InitTarget,
         "build": BuildTarget,
+        "build-all": BuildAllTarget,
+        "check": CheckTarget,
+        "query": QueryTarget,
+        "check-links": CheckLinksTarget,
+        "export": ExportTarget,
+        "rating-server": RatingServerTarget,
     }
 
     if not target_name in targets:
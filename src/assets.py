@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+
+
+CSS_BUNDLE = "bundle.min.css"
+""" Name of the CSS bundle created by `optimize_assets`. """
+
+CSS_SOURCES = [
+    "bootstrap-4.3.1-dist/css/bootstrap.min.css",
+    "fontawesome-free-5.8.1-web/css/all.min.css",
+]
+""" Stylesheets merged into the CSS bundle, relative to the output
+directory. """
+
+VENDOR_DIRS = [
+    "bootstrap-4.3.1-dist",
+    "fontawesome-free-5.8.1-web",
+]
+""" Directories from which unreferenced files are removed. """
+
+FONT_CLASSES = {
+    "fa-brands-400": ["fab"],
+    "fa-regular-400": ["far"],
+    "fa-solid-900": ["fas", "fa"],
+}
+""" Classes which require a FontAwesome font to be loaded. """
+
+FONT_FORMATS = ["woff2", "woff"]
+""" Font formats kept in the CSS bundle, all browsers supported by
+Bootstrap 4 can use at least one of them. """
+
+REGEX_CLASS_ATTR = re.compile(r"""class\s*=\s*["']([^"']*)["']""", re.IGNORECASE)
+REGEX_ID_ATTR = re.compile(r"""id\s*=\s*["']([^"']*)["']""", re.IGNORECASE)
+REGEX_LINK_ATTR = re.compile(r"""(?:href|src)\s*=\s*["']([^"'#?]*)""", re.IGNORECASE)
+REGEX_JS_STRING = re.compile(r"""["']([\w\- .#]*)["']""")
+REGEX_WORD = re.compile(r"[\w-]+")
+REGEX_SELECTOR_NAME = re.compile(r"([.#])((?:\\.|[\w-])+)")
+REGEX_NOT = re.compile(r":not\([^)]*\)")
+REGEX_CSS_URL = re.compile(r"url\(([^)]+)\)")
+
+
+def collect_used(html_files, js_files):
+    """ Returns a set of class names and ids used in given HTML files and
+    referenced by string literals in given JavaScript files. """
+    used = set()
+
+    for fpath in html_files:
+        with open(fpath, encoding="utf-8") as f:
+            html = f.read()
+        for m in REGEX_CLASS_ATTR.finditer(html):
+            used.update(m.group(1).split())
+        for m in REGEX_ID_ATTR.finditer(html):
+            used.update(m.group(1).split())
+
+    # Scripts add classes at runtime, so we keep everything that looks like
+    # a class name in their string literals
+    for fpath in js_files:
+        with open(fpath, encoding="utf-8") as f:
+            js = f.read()
+        for m in REGEX_JS_STRING.finditer(js):
+            used.update(REGEX_WORD.findall(m.group(1)))
+
+    return used
+
+
+def _skip_string(css, i):
+    quote = css[i]
+    i += 1
+    while i < len(css) and css[i] != quote:
+        i += 2 if css[i] == "\\" else 1
+    return i + 1
+
+
+def _find_block_end(css, i):
+    """ Returns an index after the "}" which closes a block opened just
+    before index `i`. """
+    depth = 1
+    while i < len(css) and depth:
+        c = css[i]
+        if c in "\"'":
+            i = _skip_string(css, i)
+            continue
+        if css.startswith("/*", i):
+            end = css.find("*/", i + 2)
+            i = len(css) if end == -1 else end + 2
+            continue
+        if c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+        i += 1
+    return i
+
+
+def _find_prelude_end(css, i):
+    """ Returns an index of the "{" or ";" which ends a prelude starting at
+    index `i`. """
+    while i < len(css) and css[i] not in "{;":
+        if css[i] in "\"'":
+            i = _skip_string(css, i)
+            continue
+        i += 1
+    return i
+
+
+def _split_selectors(selectors):
+    res = []
+    depth = 0
+    start = 0
+    for i, c in enumerate(selectors):
+        if c in "([":
+            depth += 1
+        elif c in ")]":
+            depth -= 1
+        elif c == "," and depth == 0:
+            res.append(selectors[start:i].strip())
+            start = i + 1
+    res.append(selectors[start:].strip())
+    return res
+
+
+def _is_selector_used(selector, used):
+    for _, name in REGEX_SELECTOR_NAME.findall(REGEX_NOT.sub("", selector)):
+        if name.replace("\\", "") not in used:
+            return False
+    return True
+
+
+def purge_css(css, used, at_rule=None):
+    """ Removes style rules whose selectors reference class names or ids
+    which are not in `used`. Rules nested in @media, @supports and @document
+    are purged as well and other at-rules are kept as they are. If given,
+    `at_rule` is called for each kept @font-face and other non-nested at-rule
+    with its full text and must return its replacement. """
+    res = ""
+    i = 0
+
+    while i < len(css):
+        if css[i].isspace():
+            i += 1
+            continue
+
+        if css.startswith("/*", i):
+            end = css.find("*/", i + 2)
+            end = len(css) if end == -1 else end + 2
+            # Keep license comments
+            if css.startswith("/*!", i):
+                res += css[i:end] + "\n"
+            i = end
+            continue
+
+        end = _find_prelude_end(css, i)
+        prelude = css[i:end].strip()
+
+        if end >= len(css) or css[end] == ";":
+            res += prelude + ";"
+            i = end + 1
+            continue
+
+        block_end = _find_block_end(css, end + 1)
+        body = css[end + 1:block_end - 1]
+
+        if prelude.startswith("@"):
+            name = prelude[1:].split(None, 1)[0].split("(", 1)[0].lower()
+            if name in ("media", "supports", "document"):
+                body = purge_css(body, used, at_rule)
+                if body:
+                    res += prelude + "{" + body + "}"
+            else:
+                text = prelude + "{" + body + "}"
+                res += at_rule(text) if at_rule else text
+        else:
+            selectors = [s for s in _split_selectors(prelude) if _is_selector_used(s, used)]
+            if selectors:
+                res += ",".join(selectors) + "{" + body + "}"
+
+        i = block_end
+
+    return res
+
+
+def optimize_assets(docs_dir, log=print):
+    """ Replaces Bootstrap and FontAwesome stylesheets in `docs_dir` by a
+    single bundle which contains only rules used by the generated pages and
+    removes unreferenced files from their directories, including unused
+    webfonts. Pages must be rendered with the bundle already linked. """
+    html_files = []
+    for root, _, files in os.walk(docs_dir):
+        for file in files:
+            if file.endswith(".html"):
+                html_files.append(os.path.join(root, file))
+
+    referenced = set()
+    for fpath in html_files:
+        with open(fpath, encoding="utf-8") as f:
+            for m in REGEX_LINK_ATTR.finditer(f.read()):
+                referenced.add(os.path.normpath(m.group(1)))
+
+    js_files = [os.path.join(docs_dir, r) for r in referenced
+                if r.endswith(".js") and os.path.isfile(os.path.join(docs_dir, r))]
+
+    log("Collecting used CSS selectors")
+    used = collect_used(html_files, js_files)
+
+    def _font_face(text):
+        if not text.startswith("@font-face"):
+            return text
+        for font, classes in FONT_CLASSES.items():
+            if font in text:
+                if not used.intersection(classes):
+                    return ""
+                break
+        # Keep only modern font formats
+        urls = []
+        for url in REGEX_CSS_URL.findall(text):
+            ext = os.path.splitext(url.split("?")[0].split("#")[0])[1][1:]
+            if ext in FONT_FORMATS and url not in urls:
+                urls.append(url)
+        urls.sort(key=lambda u: FONT_FORMATS.index(os.path.splitext(u)[1][1:]))
+        src = ",".join('url({}) format("{}")'.format(u, os.path.splitext(u)[1][1:]) for u in urls)
+        return re.sub(r"src:[^;}]*(;src:[^;}]*)?", "src:" + src, text, count=1)
+
+    bundle = ""
+    for source in CSS_SOURCES:
+        fpath = os.path.join(docs_dir, source)
+        log("Purging", fpath)
+        with open(fpath, encoding="utf-8") as f:
+            css = f.read()
+        css = purge_css(css, used, at_rule=_font_face)
+
+        # Make URLs relative to the bundle
+        source_dir = os.path.dirname(source)
+
+        def _rebase(m):
+            url = m.group(1).strip("\"'")
+            if re.match(r"^(data:|[a-z]+://|/)", url):
+                return m.group(0)
+            rebased = os.path.normpath(os.path.join(source_dir, url)).replace(os.sep, "/")
+            referenced.add(os.path.normpath(rebased.split("?")[0].split("#")[0]))
+            return "url({})".format(rebased)
+
+        bundle += REGEX_CSS_URL.sub(_rebase, css) + "\n"
+
+    with open(os.path.join(docs_dir, CSS_BUNDLE), "w", encoding="utf-8") as f:
+        f.write(bundle)
+
+    for vendor_dir in VENDOR_DIRS:
+        for root, _, files in os.walk(os.path.join(docs_dir, vendor_dir), topdown=False):
+            for file in files:
+                fpath = os.path.join(root, file)
+                rel = os.path.normpath(os.path.relpath(fpath, docs_dir))
+                if rel in referenced or file.upper().startswith("LICENSE"):
+                    continue
+                os.remove(fpath)
+            if not os.listdir(root):
+                os.rmdir(root)
@@ -0,0 +1,893 @@
+# -*- coding: utf-8 -*-
+import collections
+import datetime
+import hashlib
+import os
+import shutil
+import time
+
+from .meta import Meta
+from .output import DirectoryOutput, ArchiveOutput, QueuedOutput
+from .parser import Parser, Constructor, Enum, is_documented
+from .tokenizer import Tokenizer, tokenize_parallel
+
+
+GMDOC_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+""" Path to the GMDoc directory. """
+
+
+IO_JOBS = 8
+""" Number of threads reading and writing files during a build. """
+
+IO_QUEUE_SIZE = 64
+""" Maximum number of files read ahead of parsing or waiting to be written
+during a build. """
+
+PARALLEL_TOKENIZE_SIZE = 4 * 1024 * 1024
+""" Scripts with at least this many characters are split and tokenized on
+multiple processes. """
+
+
+def _silent(*args, **kwargs):
+    pass
+
+
+def prefetch(func, items, jobs=IO_JOBS, window=IO_QUEUE_SIZE):
+    """ Yields `func(item)` for each item, in order. Calls are made ahead on
+    a pool of `jobs` threads, but at most `window` results are kept waiting
+    for the consumer. """
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = collections.deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+DOCS_DIRS = ["docs_src", "docs_build"]
+""" Directories of documentation in the root of a project, which never
+contain scripts. """
+
+
+def find_scripts(project_dir, prefix, exclude=()):
+    """ Yields paths to scripts of a project, in a stable order, so builds
+    are reproducible. Hidden directories (e.g. `.git`), directories of
+    documentation and directories in `exclude` are skipped. """
+    exclude = set(os.path.abspath(d) for d in exclude)
+    for root, dirs, files in os.walk(project_dir):
+        dirs[:] = sorted(
+            d for d in dirs
+            if not d.startswith(".")
+            and not (root == project_dir and d in DOCS_DIRS)
+            and os.path.abspath(os.path.join(root, d)) not in exclude)
+        for file in sorted(files):
+            if file.startswith(prefix) and file[-4:] == ".gml":
+                yield os.path.join(root, file)
+
+
+def iter_resources(project_dir, prefix, log=print, cache=None):
+    """ Yields tuples (path, script) for each parsed script, one file at a
+    time. Files are read ahead on a pool of threads while scripts are being
+    parsed.
+
+    If a dictionary `cache` is given, parsed scripts are stored in it and
+    reused on subsequent calls until the file's size or mtime changes.
+    """
+    def _read(fpath):
+        key = None
+        if cache is not None:
+            stat = os.stat(fpath)
+            key = (stat.st_mtime_ns, stat.st_size)
+            cached = cache.get(fpath)
+            if cached and cached[0] == key:
+                return fpath, key, None
+        with open(fpath) as f:
+            return fpath, key, f.read()
+
+    for fpath, key, text in prefetch(_read, find_scripts(project_dir, prefix)):
+        if text is None:
+            yield fpath, cache[fpath][1]
+            continue
+
+        log("Parsing", fpath)
+
+        if len(text) >= PARALLEL_TOKENIZE_SIZE:
+            tokens = tokenize_parallel(text)
+        else:
+            tokens = Tokenizer().tokenize(text)
+        parser = Parser(tokens)
+        scope = parser.parse()
+        scope.name = os.path.basename(fpath)
+
+        if cache is not None:
+            cache[fpath] = (key, scope)
+
+        yield fpath, scope
+
+
+def get_build_date(project_dir, prefix, exclude=()):
+    """ Returns the date of a build as a datetime in UTC. It is taken from
+    the SOURCE_DATE_EPOCH environment variable if set, otherwise it is the
+    newest modification time of gmdoc.json, hand-written pages and scripts,
+    so rebuilding an unchanged project gives byte-identical output. Scripts
+    are searched for like in `find_scripts`, skipping `exclude`. """
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if epoch:
+        return datetime.datetime.fromtimestamp(int(epoch), datetime.timezone.utc)
+
+    newest = 0
+    meta_path = os.path.join(project_dir, "gmdoc.json")
+    if os.path.exists(meta_path):
+        newest = os.stat(meta_path).st_mtime
+
+    docs_src_dir = os.path.join(project_dir, "docs_src")
+    gen_dir = os.path.join(docs_src_dir, "ScriptingAPI")
+    for root, dirs, files in os.walk(docs_src_dir):
+        # Markdown generated from scripts is rewritten on every build
+        if root == gen_dir:
+            dirs[:] = []
+            continue
+        for file in files:
+            newest = max(newest, os.stat(os.path.join(root, file)).st_mtime)
+
+    for fpath in find_scripts(project_dir, prefix, exclude):
+        newest = max(newest, os.stat(fpath).st_mtime)
+
+    return datetime.datetime.fromtimestamp(int(newest), datetime.timezone.utc)
+
+
+def flatten_toc(toc):
+    flattened = []
+
+    def get_name(v):
+        return os.path.splitext(os.path.basename(v))[0] + ".html"
+
+    for _, v in toc.items():
+        if isinstance(v, dict):
+            flattened.append(get_name(v["file"]))
+            flattened += flatten_toc(v.get("pages", {}))
+        else:
+            flattened.append(get_name(v))
+
+    return flattened
+
+
+def map_toc_files(toc, docs_src_dir):
+    """ Returns a dictionary of names of pages in a table of contents (e.g.
+    "index.html") to absolute paths of their sources. """
+    files = {}
+    for _, v in toc.items():
+        fpath = v["file"] if isinstance(v, dict) else v
+        if not os.path.isabs(fpath):
+            fpath = os.path.join(docs_src_dir, fpath)
+        files[os.path.splitext(os.path.basename(fpath))[0] + ".html"] = fpath
+        if isinstance(v, dict):
+            files.update(map_toc_files(v.get("pages", {}), docs_src_dir))
+    return files
+
+
+def flatten_resources(parsed):
+    resources = []
+    for p in parsed:
+        for c in p.children:
+            resources.append(c)
+    resources.sort(key=lambda r: r.name)
+    return resources
+
+
+class Stopwatch(object):
+    """ Measures time spent in consecutive phases of a build. """
+
+    def __init__(self):
+        self.phases = {}
+        self._last = time.perf_counter()
+
+    def lap(self, phase):
+        """ Ends a phase, adding time since the end of the previous one. """
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._last
+        self._last = now
+
+
+class BuildResult(object):
+    """ Statistics of a finished build. The output backend the documentation
+    was written into is available in `output`. """
+
+    def __init__(self, *args, **kwargs):
+        self.out_dir = kwargs.get("out_dir", "")
+        self.output = kwargs.get("output", None)
+        self.scripts = kwargs.get("scripts", 0)
+        self.scripts_parsed = kwargs.get("scripts_parsed", 0)
+        self.resources = kwargs.get("resources", 0)
+        self.pages = kwargs.get("pages", 0)
+        self.pages_skipped = kwargs.get("pages_skipped", 0)
+        self.time = kwargs.get("time", 0.0)
+        self.phases = kwargs.get("phases", {})
+        self.broken_links = kwargs.get("broken_links", None)
+
+    def serialize(self):
+        return {
+            "out_dir": self.out_dir,
+            "scripts": self.scripts,
+            "scripts_parsed": self.scripts_parsed,
+            "resources": self.resources,
+            "pages": self.pages,
+            "pages_skipped": self.pages_skipped,
+            "time": self.time,
+            "phases": self.phases,
+            "broken_links": None if self.broken_links is None
+            else [b.serialize() for b in self.broken_links],
+        }
+
+    def __repr__(self):
+        return str(self.serialize())
+
+
+class Builder(object):
+    """ Builds documentation of projects. Compiled templates and parsed
+    scripts are kept between calls of `build`, so a single instance can be
+    reused to rebuild documentation quickly.
+
+    Compiled templates are also stored on disk in `cache_dir` (defaults to a
+    directory in the system's temp directory), so new processes do not have
+    to compile them again.
+    """
+
+    def __init__(self, gmdoc_dir=GMDOC_DIR, log=print, cache_dir=None):
+        self.gmdoc_dir = gmdoc_dir
+        self.template_dir = os.path.join(gmdoc_dir, "template")
+        self.cache_dir = cache_dir
+        self.log = log if log else _silent
+        self._environment = None
+        self._parsed = {}
+        self._asset_store = None
+
+    def get_template(self, name):
+        """ Returns a compiled Jinja template from the template directory. The
+        template is compiled again only if it was modified. """
+        if not self._environment:
+            from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+            if self.cache_dir:
+                os.makedirs(self.cache_dir, exist_ok=True)
+            self._environment = Environment(
+                loader=FileSystemLoader(self.template_dir),
+                bytecode_cache=FileSystemBytecodeCache(self.cache_dir))
+        self.log("Loading template")
+        return self._environment.get_template(name)
+
+    def copy_assets(self, docs_dir, link=False, update=False):
+        """ Copies template assets into `docs_dir`. With `link` enabled, the
+        assets are hardlinked from the first output directory they were
+        copied into (the asset store), falling back to copying when linking
+        is not possible. With `update` enabled, `docs_dir` can already exist
+        and only assets which differ in size or modification time are copied,
+        except for the template itself, which is written as the index page. """
+        if update:
+            def _copy_changed(src, dst):
+                if os.path.exists(dst):
+                    a, b = os.stat(src), os.stat(dst)
+                    if a.st_size == b.st_size and int(a.st_mtime) == int(b.st_mtime):
+                        return dst
+                # The file can be hardlinked into other output directories,
+                # so it is replaced instead of being written into
+                tmp = dst + ".tmp"
+                shutil.copy2(src, tmp)
+                os.replace(tmp, dst)
+                return dst
+
+            shutil.copytree(self.template_dir, docs_dir,
+                            ignore=lambda d, _: ["index.html"] if d == self.template_dir else [],
+                            copy_function=_copy_changed, dirs_exist_ok=True)
+            return
+
+        if not link:
+            shutil.copytree(self.template_dir, docs_dir)
+            return
+
+        store = self._asset_store
+
+        def _link(src, dst):
+            if store:
+                try:
+                    os.link(os.path.join(store, os.path.relpath(src, self.template_dir)), dst)
+                    return dst
+                except OSError:
+                    pass
+            return shutil.copy2(src, dst)
+
+        # The template itself is overwritten by the index page, which would
+        # also overwrite the file in every other linked directory
+        shutil.copytree(self.template_dir, docs_dir,
+                        ignore=lambda d, _: ["index.html"] if d == self.template_dir else [],
+                        copy_function=_link)
+
+        if not store or not os.path.isdir(store):
+            self._asset_store = docs_dir
+
+    def build(self, project_dir, out_dir=None, options={}):
+        """ Builds documentation of a project into `out_dir` (defaults to
+        `docs_build` in the project's directory) and returns a BuildResult.
+
+        Supported options are:
+          * `interactive` - Allow asking for input when gmdoc.json needs to
+            be upgraded. Defaults to False.
+          * `link_assets` - Hardlink template assets shared with previous
+            builds instead of copying them. Defaults to False.
+          * `optimize_assets` - Merge Bootstrap and FontAwesome stylesheets
+            into a single bundle containing only rules used by the generated
+            pages and remove unused files from their directories. Defaults
+            to False.
+          * `offline` - Write a service worker which caches all pages and
+            assets for offline use. Defaults to False.
+          * `check_links` - Check links in the generated pages. Broken links
+            are stored in `BuildResult.broken_links`. Defaults to False.
+          * `version` - Name of the documented version. The documentation is
+            then built into `out_dir/version`, with files identical across
+            versions stored only once. See `versions.publish` for more info.
+          * `streaming` - Build in two passes, keeping only the table of
+            contents and names of documented items in memory and parsing
+            scripts again one at a time when writing their pages. References
+            between scripts and members of constructors are kept on disk
+            between the passes. Peak memory then grows only with the number
+            of documented items, not with the size of scripts. Defaults to
+            False.
+          * `incremental` - Keep the output directory and render only pages
+            whose inputs changed since the previous incremental build into
+            it. Fingerprints of pages are kept in a manifest in the system's
+            temp directory. Defaults to False.
+          * `output` - An output backend (see module `output`) into which
+            the documentation is written instead of `out_dir`. Markdown
+            generated from scripts is then only kept in memory, so nothing
+            is written into the project.
+            Optimizing assets, writing a service worker, checking links,
+            versioning and incremental builds require a DirectoryOutput.
+          * `log` - Overrides the Builder's log function.
+        """
+        from .incremental import PageCache
+        from .printer import make_page_data
+        from .xref import UsageIndex, get_default_path as get_usages_path
+
+        log = options.get("log", self.log) or _silent
+        start = time.perf_counter()
+        stopwatch = Stopwatch()
+
+        meta_path = os.path.join(project_dir, "gmdoc.json")
+        docs_src_dir = os.path.join(project_dir, "docs_src")
+        docs_dir = out_dir if out_dir else os.path.join(project_dir, "docs_build")
+
+        output = options.get("output")
+        if isinstance(output, DirectoryOutput):
+            docs_dir = output.root
+            output = None
+
+        if output is not None:
+            for option in ["optimize_assets", "offline", "check_links", "version", "incremental"]:
+                if options.get(option):
+                    raise Exception("Option {} requires a directory output!".format(option))
+
+        version = options.get("version")
+        if version:
+            from .versions import check_version
+            check_version(version)
+            versions_root = docs_dir
+            docs_dir = os.path.join(versions_root, ".staging-" + version)
+
+        log("Loading meta")
+        meta = Meta.load(meta_path, interactive=options.get("interactive", False))
+
+        _date = get_build_date(
+            project_dir, meta.prefix, [versions_root if version else docs_dir])
+        datestr = _date.strftime("%B %d, %Y")
+        yearstr = _date.strftime("%Y")
+        stopwatch.lap("meta")
+
+        if isinstance(output, ArchiveOutput) and output.mtime is None:
+            output.mtime = _date.timestamp()
+
+        cache = None
+        if options.get("incremental", False):
+            cache = PageCache(docs_dir)
+        elif output is None:
+            PageCache(docs_dir).discard()
+
+        if output is None:
+            output = DirectoryOutput(docs_dir)
+            # Pages of the previous build are kept only if their
+            # fingerprints are known
+            update = cache is not None and cache.load()
+            if not update:
+                log("Deleting {}".format(docs_dir))
+                output.clear()
+            log("Copying resources from {} to {}".format(
+                self.template_dir, docs_dir))
+            self.copy_assets(docs_dir, link=options.get("link_assets", False), update=update)
+        else:
+            log("Copying resources from {}".format(self.template_dir))
+            # The template is written as the index page
+            output.copytree(
+                self.template_dir,
+                ignore=lambda d, _: ["index.html"] if d == self.template_dir else [])
+        stopwatch.lap("assets")
+
+        # Pages are written in the background while others are rendered.
+        # Archives need a single writer to keep their content in order.
+        queued = QueuedOutput(
+            output,
+            IO_JOBS if isinstance(output, DirectoryOutput) else 1,
+            IO_QUEUE_SIZE)
+
+        gen_dir = os.path.join(docs_src_dir, "ScriptingAPI")
+        gen_output = None
+        if isinstance(output, DirectoryOutput):
+            os.makedirs(gen_dir, exist_ok=True)
+            gen_output = QueuedOutput(DirectoryOutput(gen_dir), IO_JOBS, IO_QUEUE_SIZE)
+        # Other outputs do not touch the filesystem, pages are rendered from
+        # the generated Markdown kept in memory
+
+        context = {
+            "project_dir": project_dir,
+            "docs_src_dir": docs_src_dir,
+            "docs_dir": docs_dir,
+            "output": queued,
+            "gen_dir": gen_dir,
+            "gen_output": gen_output,
+            "meta": meta,
+            "template": self.get_template("index.html"),
+            "data": make_page_data(meta, datestr, yearstr),
+            "log": log,
+            "stopwatch": stopwatch,
+            "page_cache": cache,
+            # References between scripts, kept on disk between builds
+            "usages": UsageIndex(get_usages_path(project_dir, self.cache_dir)),
+        }
+        context["data"]["version"] = version
+        stopwatch.lap("template")
+
+        optimize = options.get("optimize_assets", False)
+        if optimize:
+            from .assets import CSS_BUNDLE
+            context["data"]["css_bundle"] = CSS_BUNDLE
+
+        offline = options.get("offline", False)
+        if offline:
+            from .offline import SERVICE_WORKER
+            context["data"]["service_worker"] = SERVICE_WORKER
+
+        try:
+            if options.get("streaming", False):
+                result = self._build_streaming(context)
+            else:
+                result = self._build(context)
+        finally:
+            context["usages"].close()
+            if context["gen_output"] is not None:
+                context["gen_output"].close()
+            context["output"].close()
+
+        if cache is not None:
+            cache.remove_stale(log=log)
+            cache.save()
+            result.pages_skipped = cache.skipped
+            log("Skipped {} unchanged pages".format(cache.skipped))
+
+        if optimize:
+            from .assets import optimize_assets
+            log("Optimizing assets")
+            optimize_assets(docs_dir, log=log)
+            stopwatch.lap("optimize")
+
+        if offline:
+            from .offline import write_service_worker
+            write_service_worker(docs_dir, log=log)
+            stopwatch.lap("offline")
+
+        if options.get("check_links", False):
+            from .linkcheck import check_links
+            log("Checking links")
+            result.broken_links = check_links(docs_dir)
+            stopwatch.lap("links")
+
+        if version:
+            from .versions import publish
+            log("Publishing version {}".format(version))
+            publish(docs_dir, versions_root, version, log=log)
+            docs_dir = os.path.join(versions_root, version)
+            stopwatch.lap("publish")
+
+        result.out_dir = docs_dir if isinstance(output, DirectoryOutput) else ""
+        result.output = output
+        result.time = time.perf_counter() - start
+        result.phases = stopwatch.phases
+        return result
+
+    @staticmethod
+    def _toc_entry(r, fname):
+        return {
+            "file": fname,
+            "deprecated": True if r.docs.get_tag("deprecated") else False,
+            "obsolete": True if r.docs.get_tag("obsolete") else False
+        }
+
+    @staticmethod
+    def _used_by(r, usages, pages):
+        """ Returns a tuple (used_by, total) of at most `USED_BY_LIMIT`
+        places where a resource is referenced from other resources, in the
+        format of `resource_to_markdown`, and the number of all of them. """
+        from .printer import USED_BY_LIMIT
+        used_by = [
+            (file, caller, caller if caller in pages else None)
+            for file, caller in usages.get(r.name, USED_BY_LIMIT)
+        ]
+        total = usages.count(r.name) if len(used_by) == USED_BY_LIMIT else len(used_by)
+        return used_by, total
+
+    def _page_base(self, context):
+        """ Returns a fingerprint of everything shared by all pages, which
+        are the template, GMDoc's renderer, template data (including the
+        table of contents) and options. """
+        import jinja2
+        import mistune
+        from . import highlighter, printer
+        from .incremental import fingerprint
+
+        sources = []
+        for fpath in [os.path.join(self.template_dir, "index.html"), printer.__file__, highlighter.__file__]:
+            with open(fpath, encoding="utf-8") as f:
+                sources.append(f.read())
+
+        return fingerprint(
+            sources, jinja2.__version__, mistune.__version__,
+            context["data"], context["meta"].toc, context["meta"].inline_members)
+
+    @staticmethod
+    def _content_fingerprint(r, used_by, inherited):
+        """ Returns a fingerprint of inputs of a generated page, where
+        `used_by` is a tuple returned by `_used_by`. """
+        from .incremental import entity_fingerprint, fingerprint
+
+        return fingerprint(
+            entity_fingerprint(r), used_by,
+            [(origin, entity_fingerprint(m)) for m, origin in inherited] if inherited else None)
+
+    @staticmethod
+    def _include_changed(context, generated=(), skipped=()):
+        """ Returns a function for the `include` argument of `make_pages`,
+        which includes pages in `generated` unless they are in `skipped`,
+        and other pages only if their source changed. """
+        cache = context["page_cache"]
+        files = map_toc_files(context["meta"].toc, context["docs_src_dir"])
+
+        def _include(path):
+            page = path[-1]
+            if page in generated:
+                return page not in skipped
+            fpath = files.get(page + ".html")
+            if fpath is None:
+                return True
+            content = None
+            if os.path.exists(fpath):
+                # Folders without a file are rendered without content
+                with open(fpath, "rb") as f:
+                    content = hashlib.sha1(f.read()).hexdigest()
+            return not cache.is_fresh(page + ".html", content)
+
+        return _include
+
+    @staticmethod
+    def _log_cycles(hierarchy, log):
+        for cycle in hierarchy.cycles:
+            log("Warning: Cyclic inheritance {}".format(" -> ".join(cycle)))
+
+    @staticmethod
+    def _index_usages(usages, project_dir, fpath, script):
+        """ Stores references of a script into the index, unless they are
+        already stored for its current size and mtime. Returns the path to
+        the script relative to the project. """
+        file = os.path.relpath(fpath, project_dir).replace(os.sep, "/")
+        stat = os.stat(fpath)
+        usages.update(file, (stat.st_mtime_ns, stat.st_size), script.references)
+        return file
+
+    def _build(self, context):
+        from .inheritance import Hierarchy
+        from .printer import resource_to_markdown, make_pages
+
+        log = context["log"]
+        meta = context["meta"]
+        gen_dir = context["gen_dir"]
+
+        log("Parsing scripting API documentation")
+        modified = []
+
+        def _log_parse(*args):
+            modified.append(args)
+            log(*args)
+
+        project_dir = context["project_dir"]
+        usages = context["usages"]
+        files = []
+        parsed = []
+        for fpath, s in iter_resources(project_dir, meta.prefix, log=_log_parse, cache=self._parsed):
+            file = self._index_usages(usages, project_dir, fpath, s)
+            files.append(file)
+            parsed.append(s)
+        usages.retain(files)
+        usages.commit()
+        resources = flatten_resources(parsed)
+        context["stopwatch"].lap("parse")
+
+        page_names = set()
+        constructors = {}
+        for r in resources:
+            if is_documented(r):
+                page_names.add(r.name)
+                if isinstance(r, (Constructor, Enum)):
+                    page_names.update(r.name + "." + c.name for c in r.get_children(_docs=True))
+                if isinstance(r, Constructor):
+                    constructors[r.name] = r
+        hierarchy = Hierarchy(
+            {name: Hierarchy.get_base(c) for name, c in constructors.items()}, constructors.get)
+
+        scripting_api_toc = {
+            "file": "ScriptingAPI.md",
+            "pages": {}
+        }
+
+        # Inputs of generated pages, in the format of resource_to_markdown
+        contents = {}
+
+        for r in resources:
+            name = r.name
+
+            if not is_documented(r):
+                log("Skipping {} of type {}".format(r.name, type(r).__name__))
+                continue
+
+            fname = os.path.abspath("{}/{}.md".format(gen_dir, name))
+            contents[fname] = (
+                r, self._used_by(r, usages, page_names),
+                hierarchy.get_inherited(r) if r.name in constructors else None)
+
+            scripting_api_toc["pages"][name] = self._toc_entry(r, fname)
+
+            if isinstance(r, (Constructor, Enum)) and not meta.inline_members:
+                children = r.get_children(_docs=True)
+                if children:
+                    children_toc = {}
+                    for c in children:
+                        cfname = os.path.abspath("{}/{}.{}.md".format(gen_dir, r.name, c.name))
+                        contents[cfname] = (c, None, None)
+                        children_toc[c.name] = self._toc_entry(c, cfname)
+                    scripting_api_toc["pages"][name]["pages"] = children_toc
+
+        meta.toc["Scripting API"] = scripting_api_toc
+        self._log_cycles(hierarchy, log)
+
+        cache = context["page_cache"]
+        if cache:
+            cache.base = self._page_base(context)
+
+        # Generated Markdown is kept for rendering, so it is not read back
+        sources = {}
+        skipped = set()
+
+        for fname, (r, used_by, inherited) in contents.items():
+            page = os.path.splitext(os.path.basename(fname))[0]
+            if cache and cache.is_fresh(
+                    page + ".html", self._content_fingerprint(r, used_by, inherited)):
+                skipped.add(page)
+                continue
+            log("Generating Markdown for", page)
+            places, total = used_by if used_by else (None, None)
+            sources[fname] = resource_to_markdown(
+                r, places, meta.inline_members, inherited=inherited, used_by_total=total)
+
+        if context["gen_output"] is not None:
+            for fname, md in sources.items():
+                context["gen_output"].write(os.path.basename(fname), md)
+        context["stopwatch"].lap("markdown")
+
+        pages = make_pages(
+            meta,
+            flatten_toc(meta.toc),
+            docs_src_dir=context["docs_src_dir"],
+            docs_dir=context["docs_dir"],
+            template=context["template"],
+            log=log,
+            data=context["data"],
+            output=context["output"],
+            sources=sources,
+            include=self._include_changed(
+                context, set(os.path.splitext(os.path.basename(f))[0] for f in contents), skipped)
+            if cache else None
+        )
+        context["stopwatch"].lap("pages")
+
+        return BuildResult(
+            scripts=len(parsed),
+            scripts_parsed=len(modified),
+            resources=len(resources),
+            pages=pages)
+
+    def _build_streaming(self, context):
+        from .inheritance import Hierarchy, SummaryStore
+        from .printer import resource_to_markdown, make_page, make_pages
+
+        log = context["log"]
+        meta = context["meta"]
+        gen_dir = context["gen_dir"]
+        project_dir = context["project_dir"]
+
+        summaries = SummaryStore()
+        try:
+            # Pass one: Index documented items, throwing away the parsed scripts
+            log("Indexing scripting API documentation")
+            index = []
+            # Sections of members on their parents' pages
+            sections = []
+            # Names of documented constructors and of the constructors they
+            # extend, their members are stored on disk until pass two
+            bases = {}
+            # Places of the documented items which get pages, when more
+            # items have the same name, the last one wins, as in the TOC
+            owners = {}
+            usages = context["usages"]
+            files = []
+            resources = 0
+
+            for fpath, script in iter_resources(project_dir, meta.prefix, log=log):
+                files.append(self._index_usages(usages, project_dir, fpath, script))
+                resources += len(script.children)
+                for i, r in enumerate(script.children):
+                    if not is_documented(r):
+                        log("Skipping {} of type {}".format(r.name, type(r).__name__))
+                        continue
+                    owners[r.name] = (fpath, i)
+                    fname = os.path.abspath("{}/{}.md".format(gen_dir, r.name))
+                    entry = self._toc_entry(r, fname)
+                    if isinstance(r, Constructor):
+                        bases[r.name] = Hierarchy.get_base(r)
+                        summaries.add(r)
+                    if isinstance(r, (Constructor, Enum)) and meta.inline_members:
+                        sections += [r.name + "." + c.name for c in r.get_children(_docs=True)]
+                    elif isinstance(r, (Constructor, Enum)):
+                        children = r.get_children(_docs=True)
+                        if children:
+                            entry["pages"] = {}
+                            for c in children:
+                                cfname = os.path.abspath("{}/{}.{}.md".format(gen_dir, r.name, c.name))
+                                entry["pages"][c.name] = self._toc_entry(c, cfname)
+                    index.append((r.name, entry))
+
+            usages.retain(files)
+            usages.commit()
+            scripts = len(files)
+            del files
+
+            index.sort(key=lambda i: i[0])
+            meta.toc["Scripting API"] = {
+                "file": "ScriptingAPI.md",
+                "pages": dict(index)
+            }
+            del index
+
+            flattened = flatten_toc(meta.toc)
+            positions = {name: i for i, name in enumerate(flattened)}
+            page_names = set(os.path.splitext(name)[0] for name in flattened)
+            page_names.update(sections)
+            del sections
+            hierarchy = Hierarchy(bases, summaries.get)
+
+            cache = context["page_cache"]
+            if cache:
+                cache.base = self._page_base(context)
+            context["stopwatch"].lap("index")
+
+            changed = self._include_changed(context) if cache else None
+
+            def _include(path):
+                # Pages of scripts are written in pass two
+                if path[0] == "ScriptingAPI" and len(path) > 1:
+                    return False
+                return changed(path) if changed else True
+
+            # Custom pages and the Scripting API root page
+            pages = make_pages(
+                meta,
+                flattened,
+                docs_src_dir=context["docs_src_dir"],
+                docs_dir=context["docs_dir"],
+                template=context["template"],
+                log=log,
+                data=context["data"],
+                output=context["output"],
+                include=_include
+            )
+            context["stopwatch"].lap("pages")
+
+            # Pass two: Parse scripts again and write their pages right away
+            def _write(r, fname, path, breadcrumb, used_by=None, inherited=None):
+                if cache and cache.is_fresh(
+                        fname + ".html", self._content_fingerprint(r, used_by, inherited)):
+                    return
+                places, total = used_by if used_by else (None, None)
+                md = resource_to_markdown(
+                    r, places, meta.inline_members, inherited=inherited, used_by_total=total)
+                log("Generating Markdown for", fname)
+                fpath = os.path.abspath("{}/{}.md".format(gen_dir, fname))
+                if context["gen_output"] is not None:
+                    context["gen_output"].write("{}.md".format(fname), md)
+
+                i = positions["{}.html".format(fname)]
+                make_page(
+                    meta, breadcrumb[-1], fpath, path, breadcrumb,
+                    link_prev=flattened[i - 1] if i > 0 else None,
+                    link_next=flattened[i + 1] if i < len(flattened) - 1 else None,
+                    docs_dir=context["docs_dir"],
+                    template=context["template"],
+                    data=context["data"],
+                    log=log,
+                    source=md,
+                    output=context["output"])
+
+            for fpath, script in iter_resources(project_dir, meta.prefix, log=log):
+                for i, r in enumerate(script.children):
+                    if owners.get(r.name) != (fpath, i):
+                        # Not documented or replaced by another item
+                        continue
+                    path = ["ScriptingAPI", r.name]
+                    breadcrumb = ["Scripting API", r.name]
+                    _write(r, r.name, path, breadcrumb,
+                           self._used_by(r, usages, page_names),
+                           hierarchy.get_inherited(r) if isinstance(r, Constructor) else None)
+                    if isinstance(r, (Constructor, Enum)) and not meta.inline_members:
+                        for c in r.get_children(_docs=True):
+                            cname = "{}.{}".format(r.name, c.name)
+                            _write(c, cname, path + [cname], breadcrumb + [c.name])
+            self._log_cycles(hierarchy, log)
+            context["stopwatch"].lap("scripts")
+
+        finally:
+            summaries.close()
+
+        return BuildResult(
+            scripts=scripts,
+            scripts_parsed=scripts,
+            resources=resources,
+            pages=pages)
+
+    def build_all(self, projects, options={}, jobs=None):
+        """ Builds documentation of multiple projects, sharing compiled
+        templates, caches and template assets between them.
+
+        `projects` is a list of tuples (project_dir, out_dir). The projects
+        are built on a pool of `jobs` threads (defaults to the number of
+        CPUs). Returns a list of BuildResults, or exceptions for failed
+        builds, in the order of `projects`.
+        """
+        options = dict(options)
+        options.setdefault("link_assets", True)
+
+        def _build(project):
+            try:
+                return self.build(project[0], project[1], options)
+            except Exception as e:
+                return e
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        # Build the first project alone to warm up caches and the asset store
+        results = [_build(p) for p in projects[:1]]
+        with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+            results += list(executor.map(_build, projects[1:]))
+        return results
+
+
+def build(project_dir, out_dir=None, options={}):
+    """ Builds documentation of a project using a new Builder. See
+    `Builder.build` for more info. """
+    return Builder(log=options.get("log", print)).build(project_dir, out_dir, options)
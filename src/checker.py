@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from .parser import Parser, Function, Constructor, Enum, Macro, Member, Variable, is_documented
+from .tokenizer import Tokenizer, TokenizationError
+from .utils import get_lines
+
+
+CACHE_VERSION = 3
+""" Version of the checks and of the parsed model they run on, cached
+results of other versions are ignored. """
+
+ARGUMENT_NAMES = set(["argument", "argument_count"] + ["argument" + str(i) for i in range(16)])
+""" Names through which functions can access arguments which they do not
+declare. """
+
+DESC_TAGS = {
+    Macro: "macro",
+    Enum: "enum",
+    Member: "member",
+    Variable: "var",
+}
+""" Tags which can be used instead of @desc. """
+
+
+class Problem(object):
+    """ A problem in documentation at character `_offset` of a script, on
+    line `_line` (starting at 1). """
+
+    def __init__(self, _file, _offset, _symbol, _code, _message, _line=None):
+        self.file = _file
+        self.offset = _offset
+        self.line = _line
+        self.symbol = _symbol
+        self.code = _code
+        self.message = _message
+
+    def __repr__(self):
+        return "{}:{}: {} ({})".format(self.file, self.line, self.message, self.code)
+
+    def serialize(self):
+        return {
+            "file": self.file,
+            "offset": self.offset,
+            "line": self.line,
+            "symbol": self.symbol,
+            "code": self.code,
+            "message": self.message,
+        }
+
+    @staticmethod
+    def from_dict(d):
+        return Problem(d["file"], d["offset"], d["symbol"], d["code"], d["message"], d.get("line"))
+
+
+def _check_params(f, name, script, problems, file):
+    params = [p.name for p in f.docs.get_tag("param", single=False)]
+
+    # Functions using argument[n] do not declare their arguments
+    if not f.args and any(name in script.references.get(a, ()) for a in ARGUMENT_NAMES):
+        return
+
+    for p in params:
+        if p not in f.args:
+            problems.append(Problem(
+                file, f.at, name, "unknown-param",
+                "Documented parameter {} is not an argument of {}".format(p, name)))
+
+    for a in f.args:
+        if a not in params:
+            problems.append(Problem(
+                file, f.at, name, "undocumented-param",
+                "Argument {} of {} is not documented".format(a, name)))
+
+
+def check_script(script, file):
+    """ Returns a list of Problems in documentation of a parsed script,
+    without line numbers, since the script's code is not known here (see
+    `check_file`). """
+    problems = []
+
+    def _check(entity, path):
+        for c in entity.children:
+            name = ".".join(path + [c.name])
+
+            if isinstance(c, Member):
+                if not c.docs or not c.docs.get_tag("member"):
+                    problems.append(Problem(
+                        file, c.at, name, "missing-member",
+                        "Enum member {} is not documented with @member".format(name)))
+                continue
+
+            if not is_documented(c):
+                continue
+
+            if not c.docs.get_tag("desc") and not c.docs.get_tag(DESC_TAGS.get(type(c), "desc")):
+                problems.append(Problem(
+                    file, c.at, name, "missing-desc",
+                    "{} does not have a description".format(name)))
+
+            if isinstance(c, Function):
+                if not c.docs.get_tag("func"):
+                    problems.append(Problem(
+                        file, c.at, name, "missing-func",
+                        "{} is missing @func".format(name)))
+                _check_params(c, name, script, problems, file)
+
+            if isinstance(c, (Constructor, Enum)):
+                _check(c, path + [c.name])
+
+    _check(script, [])
+    return problems
+
+
+def check_file(fpath, file):
+    """ Parses a script at `fpath` and returns a list of its Problems, where
+    `file` is the script's path reported in them. """
+    with open(fpath) as f:
+        code = f.read()
+    try:
+        script = Parser(Tokenizer().tokenize(code)).parse()
+    except TokenizationError as e:
+        return [Problem(file, 0, "", "syntax-error", str(e), 1)]
+    problems = check_script(script, file)
+    for p, line in zip(problems, get_lines(code, [p.offset for p in problems])):
+        p.line = line
+    return problems
+
+
+def _check_file_serialized(args):
+    return [p.serialize() for p in check_file(*args)]
+
+
+def check_project(project_dir, prefix, jobs=None, cache_path=None, log=print):
+    """ Checks documentation of all scripts of a project on a pool of `jobs`
+    processes (defaults to the number of CPUs). Results are cached in a JSON
+    file `cache_path` (defaults to a file in the system's temp directory)
+    and scripts are checked again only when their size or mtime change.
+    Returns a list of Problems. """
+    from .builder import find_scripts
+
+    project_dir = os.path.abspath(project_dir)
+    if cache_path is None:
+        cache_path = os.path.join(
+            tempfile.gettempdir(),
+            "gmdoc-check-{}.json".format(hashlib.sha1(project_dir.encode("utf-8")).hexdigest()[:16]))
+
+    cache = {}
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "r") as f:
+                cached = json.load(f)
+            if cached.get("version") == CACHE_VERSION and cached.get("project") == project_dir:
+                cache = cached.get("files", {})
+        except ValueError:
+            pass
+
+    results = {}
+    todo = []
+    for fpath in find_scripts(project_dir, prefix):
+        file = os.path.relpath(fpath, project_dir).replace(os.sep, "/")
+        stat = os.stat(fpath)
+        key = [stat.st_mtime_ns, stat.st_size]
+        entry = cache.get(file)
+        if entry and entry["key"] == key:
+            results[file] = entry
+        else:
+            results[file] = {"key": key, "problems": None}
+            todo.append((fpath, file))
+
+    log("Checking {} of {} scripts".format(len(todo), len(results)))
+
+    if len(todo) > 1 and (jobs or os.cpu_count() or 1) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            checked = list(executor.map(
+                _check_file_serialized, todo, chunksize=max(1, len(todo) // 64)))
+    else:
+        checked = [_check_file_serialized(t) for t in todo]
+
+    for (_, file), problems in zip(todo, checked):
+        results[file]["problems"] = problems
+
+    if cache_path:
+        with open(cache_path, "w") as f:
+            json.dump({"version": CACHE_VERSION, "project": project_dir, "files": results}, f)
+
+    return [Problem.from_dict(p) for file in sorted(results) for p in results[file]["problems"]]
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import json
+
+from .parser import Scope
+
+
+def entity_to_records(script, file):
+    """ Yields one record for each named entity of a parsed script.
+
+    Ids are made of the script's file path and the dotted names of the
+    entity and its named ancestors, so they stay the same between builds
+    unless the entity is renamed or moved. Anonymous scopes are not exported,
+    their children are linked to the closest named ancestor instead.
+    """
+    used_ids = set()
+
+    def _make_id(parent_id, name):
+        _id = "{}.{}".format(parent_id, name) if "#" in parent_id \
+            else "{}#{}".format(parent_id, name)
+        unique = _id
+        n = 1
+        while unique in used_ids:
+            n += 1
+            unique = "{}~{}".format(_id, n)
+        used_ids.add(unique)
+        return unique
+
+    def _walk(entity, parent_id):
+        for c in entity.children if isinstance(entity, Scope) else []:
+            if not c.name:
+                yield from _walk(c, parent_id)
+                continue
+            _id = _make_id(parent_id, c.name)
+            yield {
+                "id": _id,
+                "parent": parent_id,
+                "kind": type(c).__name__.lower(),
+                "name": c.name,
+                "file": file,
+                "offset": c.at,
+                "docs": c.docs.serialize() if c.docs else None,
+            }
+            yield from _walk(c, _id)
+
+    yield {
+        "id": file,
+        "parent": None,
+        "kind": "script",
+        "name": script.name,
+        "file": file,
+        "offset": script.at,
+        "docs": None,
+    }
+    yield from _walk(script, file)
+
+
+def write_jsonl(records, f):
+    """ Writes records into a file-like object as JSON Lines. """
+    for r in records:
+        f.write(json.dumps(r, sort_keys=True))
+        f.write("\n")
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import functools
+import html
+
+from .tokenizer import Token, Tokenizer, TokenizationError, RESERVED
+
+
+CONSTANTS = {
+    Token.Type.ALL,
+    Token.Type.GLOBAL,
+    Token.Type.NOONE,
+    Token.Type.OTHER,
+    Token.Type.SELF,
+    Token.Type.UNDEFINED,
+}
+
+PUNCTUATION = {
+    Token.Type.BRACKET_CURLY_LEFT,
+    Token.Type.BRACKET_CURLY_RIGHT,
+    Token.Type.BRACKET_LEFT,
+    Token.Type.BRACKET_RIGHT,
+    Token.Type.BRACKET_SQUARE_LEFT,
+    Token.Type.BRACKET_SQUARE_RIGHT,
+    Token.Type.COLON,
+    Token.Type.COMMA,
+    Token.Type.DOT,
+    Token.Type.SEMICOLON,
+}
+
+OPERATORS = {
+    Token.Type.AMPERSAND,
+    Token.Type.ASTERISK,
+    Token.Type.CARET,
+    Token.Type.EQUALS,
+    Token.Type.EXCLAMATION,
+    Token.Type.GREATER_THAN,
+    Token.Type.LESS_THAN,
+    Token.Type.MINUS,
+    Token.Type.PERCENT,
+    Token.Type.PIPE,
+    Token.Type.PLUS,
+    Token.Type.QUESTION,
+    Token.Type.SLASH,
+    Token.Type.TILDE,
+}
+
+HIGHLIGHT_CACHE_SIZE = 1024
+""" Maximum number of highlighted code blocks kept in memory. """
+
+
+def get_class(tokens, index):
+    """ Returns a Prism-compatible token class for a token at given index or
+    None if the token should be printed as is. """
+    token = tokens[index]
+    _type = token.type
+
+    if token.value.lower() in RESERVED:
+        if _type in (Token.Type.TRUE, Token.Type.FALSE):
+            return "boolean"
+        if _type in CONSTANTS:
+            return "constant"
+        return "keyword"
+
+    if _type == Token.Type.MACRO:
+        return "keyword"
+    if _type in (Token.Type.COMMENT, Token.Type.DOCUMENTATION):
+        return "comment"
+    if _type == Token.Type.STRING:
+        return "string"
+    if _type == Token.Type.NUMBER:
+        return "number"
+    if _type in PUNCTUATION:
+        return "punctuation"
+    if _type in OPERATORS:
+        return "operator"
+
+    if _type == Token.Type.NAME:
+        index += 1
+        while index < len(tokens) and tokens[index].is_whitespace():
+            index += 1
+        if index < len(tokens) and tokens[index].type == Token.Type.BRACKET_LEFT:
+            return "function"
+
+    return None
+
+
+@functools.lru_cache(maxsize=HIGHLIGHT_CACHE_SIZE)
+def highlight(code):
+    """ Turns GML code into HTML markup with Prism-compatible token spans. The
+    last `HIGHLIGHT_CACHE_SIZE` results are cached by the code. """
+    try:
+        tokens = Tokenizer().tokenize(code)
+    except TokenizationError:
+        return html.escape(code, quote=False)
+
+    parts = []
+    for i, token in enumerate(tokens):
+        value = html.escape(token.value, quote=False)
+        _class = get_class(tokens, i)
+        if _class:
+            parts.append('<span class="token {}">{}</span>'.format(_class, value))
+        else:
+            parts.append(value)
+    return "".join(parts)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import os
+import tempfile
+
+from .parser import Scope
+
+
+def fingerprint(*parts):
+    """ Returns a hex SHA-1 digest of JSON serializable values. """
+    return hashlib.sha1(
+        json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def entity_fingerprint(entity):
+    """ Returns a fingerprint of the documentation of an entity and all of
+    its descendants, which is everything its page is made from. """
+    parts = []
+    stack = [entity]
+    while stack:
+        e = stack.pop()
+        parts.append((type(e).__name__, e.name, e.docs.serialize() if e.docs else None))
+        if isinstance(e, Scope):
+            stack += reversed(e.children)
+    return fingerprint(parts)
+
+
+def get_default_path(docs_dir):
+    """ Returns the path to the page manifest of an output directory, which
+    is in the system's temp directory. """
+    docs_dir = os.path.abspath(docs_dir)
+    return os.path.join(
+        tempfile.gettempdir(),
+        "gmdoc-pages-{}.json".format(hashlib.sha1(docs_dir.encode("utf-8")).hexdigest()[:16]))
+
+
+class PageCache(object):
+    """ Fingerprints of pages written into `_docs_dir`, stored in a JSON
+    manifest at `_path` (defaults to a file in the system's temp directory).
+
+    A page's fingerprint is made of `base`, which covers everything shared
+    by all pages (template, table of contents...), the name of the page and
+    fingerprints of its own inputs. Pages whose fingerprint did not change
+    since the previous build and which still exist do not need to be
+    rendered again. """
+
+    def __init__(self, _docs_dir, _path=None):
+        self.docs_dir = _docs_dir
+        self.path = _path if _path else get_default_path(_docs_dir)
+        self.base = ""
+        self.skipped = 0
+        self._old = {}
+        self._new = {}
+
+    def load(self):
+        """ Loads fingerprints of the previous build and returns True if
+        there were any. The manifest is deleted, so it is not trusted after
+        an interrupted build, which could have overwritten some pages. """
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "r") as f:
+                self._old = json.load(f)
+        except ValueError:
+            self._old = {}
+        os.remove(self.path)
+        return bool(self._old)
+
+    def discard(self):
+        """ Deletes the manifest, since pages are about to be written by a
+        build which does not record their fingerprints. """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def is_fresh(self, page, *parts):
+        """ Records the fingerprint of a page and returns True if the page
+        does not have to be rendered again. """
+        fp = fingerprint(self.base, page, *parts)
+        self._new[page] = fp
+        if self._old.get(page) == fp and os.path.exists(os.path.join(self.docs_dir, page)):
+            self.skipped += 1
+            return True
+        return False
+
+    def remove_stale(self, log=print):
+        """ Deletes pages written by the previous build which were not
+        written by this one. """
+        for page in self._old:
+            if page not in self._new:
+                fpath = os.path.join(self.docs_dir, page)
+                if os.path.exists(fpath):
+                    log("Deleting {}".format(fpath))
+                    os.remove(fpath)
+
+    def save(self):
+        with open(self.path, "w") as f:
+            json.dump(self._new, f)
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import pickle
+import sqlite3
+
+from .parser import Constructor, Function, Variable
+
+
+class Hierarchy(object):
+    """ Resolves `@extends` chains of constructors, given as a dictionary
+    `_bases` of names of constructors to names of the constructors they
+    extend (see `get_base`) or None. Constructors which are not in the
+    dictionary (e.g. undocumented ones) end the chain. Only names are kept,
+    Constructors are loaded when their members are needed by `_load(name)`
+    (e.g. `dict.get` of a dictionary of Constructors or `SummaryStore.get`).
+
+    The chain of each constructor is computed only once, reusing chains of
+    its ancestors, so deep hierarchies cost a single walk. Cycles are
+    detected and stored in `cycles` as lists of names, each constructor in a
+    cycle then inherits from all the others once. """
+
+    def __init__(self, _bases, _load):
+        self.bases = _bases
+        self.load = _load
+        self.cycles = []
+        self._chains = {}
+
+    @staticmethod
+    def get_base(c):
+        """ Returns the name of the constructor which `c` extends or None. """
+        _extends = c.docs.get_tag("extends") if c.docs else None
+        return _extends.desc.strip() if _extends and _extends.desc.strip() else None
+
+    def get_chain(self, name):
+        """ Returns a tuple of names of constructors, starting with the given
+        name, followed by its ancestors from the closest one. Returns an
+        empty tuple for unknown names. """
+        chain = self._chains.get(name)
+        if chain is not None:
+            return chain
+
+        path = []
+        seen = {}
+        tail = ()
+        cycle = None
+        current = name
+        while current is not None:
+            if current in self._chains:
+                tail = self._chains[current]
+                break
+            if current in seen:
+                cycle = seen[current]
+                self.cycles.append(path[cycle:] + [current])
+                break
+            if current not in self.bases:
+                break
+            seen[current] = len(path)
+            path.append(current)
+            current = self.bases[current]
+
+        for i in range(len(path) - 1, -1, -1):
+            if cycle is not None and i >= cycle:
+                # Each constructor in a cycle starts its own rotation of it
+                chain = tuple(path[i:] + path[cycle:i])
+            else:
+                chain = tuple(path[i:]) + tail
+            self._chains[path[i]] = chain
+
+        return self._chains.get(name, ())
+
+    def get_inherited(self, c):
+        """ Returns a list of tuples (member, origin) of documented
+        properties and methods which constructor `c` inherits, where origin
+        is the name of the constructor which defines the member. Members
+        overridden by `c` or by a closer ancestor are left out. """
+        chain = self.get_chain(c.name)
+        names = set(m.name for m in c.get_children(_type=(Variable, Function), _docs=True))
+        inherited = []
+        for origin in chain[1:]:
+            ancestor = self.load(origin)
+            for m in ancestor.get_children(_type=(Variable, Function), _docs=True):
+                if m.name not in names:
+                    names.add(m.name)
+                    inherited.append((m, origin))
+        return inherited
+
+
+def summarize(c):
+    """ Returns a copy of a Constructor with only its documentation and
+    documented properties and methods, without their contents, which is
+    enough to resolve inheritance. """
+    summary = Constructor(_name=c.name, _docs=c.docs, _at=c.at, _base=c.base)
+    for m in c.get_children(_type=(Variable, Function), _docs=True):
+        if isinstance(m, Function):
+            summary.add_child(type(m)(_name=m.name, _docs=m.docs, _at=m.at))
+        else:
+            summary.add_child(Variable(_name=m.name, _docs=m.docs, _at=m.at))
+    return summary
+
+
+class SummaryStore(object):
+    """ Summaries of constructors (see `summarize`) kept in a temporary
+    database on disk instead of in memory, which is deleted by `close`. """
+
+    def __init__(self):
+        # An empty path is a private temporary database
+        self._conn = sqlite3.connect("")
+        self._conn.execute("CREATE TABLE summaries (name TEXT PRIMARY KEY, summary BLOB NOT NULL)")
+
+    def add(self, c):
+        """ Stores a summary of Constructor `c`. """
+        self._conn.execute(
+            "INSERT OR REPLACE INTO summaries VALUES (?, ?)",
+            (c.name, pickle.dumps(summarize(c), pickle.HIGHEST_PROTOCOL)))
+
+    def get(self, name):
+        """ Returns a summary of the constructor of given name or None. """
+        row = self._conn.execute("SELECT summary FROM summaries WHERE name = ?", (name,)).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def close(self):
+        self._conn.close()
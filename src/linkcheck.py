@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import unquote
+
+
+REGEX_ANCHOR = re.compile(r"""<[^>]*?\s(?:id|name)\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+REGEX_LINK = re.compile(r"""<[^>]*?\s(?:href|src)\s*=\s*["']([^"']*)["']""", re.IGNORECASE)
+REGEX_EXTERNAL = re.compile(r"^([a-z][a-z0-9+.-]*:|//)", re.IGNORECASE)
+
+
+class BrokenLink(object):
+    def __init__(self, _file, _href, _reason):
+        self.file = _file
+        self.href = _href
+        self.reason = _reason
+
+    def __repr__(self):
+        return "{}: {} ({})".format(self.file, self.href, self.reason)
+
+    def serialize(self):
+        return {
+            "file": self.file,
+            "href": self.href,
+            "reason": self.reason,
+        }
+
+
+def scan_file(fpath):
+    """ Returns a tuple (anchors, links) of a HTML file, where anchors is a
+    set of ids and names of its elements and links is a list of all internal
+    hrefs and srcs. """
+    with open(fpath, encoding="utf-8", errors="replace") as f:
+        html = f.read()
+    anchors = set(REGEX_ANCHOR.findall(html))
+    links = [l for l in REGEX_LINK.findall(html) if l and not REGEX_EXTERNAL.match(l)]
+    return anchors, links
+
+
+def check_links(docs_dir, jobs=None):
+    """ Checks that all internal links in HTML files within `docs_dir` point
+    to existing files and anchors. Files are scanned in parallel on `jobs`
+    processes (defaults to the number of CPUs), each of them only once.
+    Returns a list of BrokenLinks. """
+    docs_dir = os.path.abspath(docs_dir)
+    html_files = []
+    for root, _, files in os.walk(docs_dir):
+        for file in files:
+            if file.endswith(".html"):
+                html_files.append(os.path.join(root, file))
+    html_files.sort()
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        scanned = dict(zip(html_files, executor.map(
+            scan_file, html_files, chunksize=max(1, len(html_files) // 64))))
+
+    exists = {}
+
+    def _exists(fpath):
+        if fpath not in exists:
+            exists[fpath] = os.path.exists(fpath)
+        return exists[fpath]
+
+    broken = []
+
+    for fpath in html_files:
+        _, links = scanned[fpath]
+        rel = os.path.relpath(fpath, docs_dir)
+        for href in links:
+            target, _, anchor = href.partition("#")
+            target = unquote(target.split("?", 1)[0])
+            anchor = unquote(anchor)
+
+            if target:
+                target_path = os.path.normpath(os.path.join(os.path.dirname(fpath), target))
+                if target.endswith("/") or os.path.isdir(target_path):
+                    target_path = os.path.join(target_path, "index.html")
+            else:
+                target_path = fpath
+
+            if not _exists(target_path):
+                broken.append(BrokenLink(rel, href, "missing file"))
+                continue
+
+            if anchor and target_path in scanned:
+                if anchor not in scanned[target_path][0]:
+                    broken.append(BrokenLink(rel, href, "missing anchor"))
+
+    return broken
+
+
+def print_report(broken, log=print):
+    """ Prints broken links grouped by the files they are in. """
+    current = None
+    for b in broken:
+        if b.file != current:
+            current = b.file
+            log(current)
+        log("  {} ({})".format(b.href, b.reason))
+    log("Found {} broken link{}".format(len(broken), "" if len(broken) == 1 else "s"))
@@ -22,6 +22,7 @@ class Meta(object):
             "rating": ""
         })
         self.toc = kwargs.get("toc", {})
+        self.inline_members = kwargs.get("inline_members", False)
 
     def serialize(self):
         return {
@@ -34,6 +35,7 @@ class Meta(object):
             "analytics": self.analytics,
             "api": self.api,
             "toc": self.toc,
+            "inline_members": self.inline_members,
         }
 
     @staticmethod
@@ -87,10 +89,11 @@ class Meta(object):
             analytics=analytics,
             api=api,
             toc=toc,
+            inline_members=old.get("inline_members", False),
         )
 
     @staticmethod
-    def load(fpath):
+    def load(fpath, interactive=True):
         with open(fpath, "r") as f:
             meta = json.load(f)
 
@@ -103,6 +106,13 @@ class Meta(object):
             ))
 
         if _version < Meta.VERSION:
+            if not interactive:
+                raise Exception((
+                    "You are trying to load a project created with an older "
+                    "version of GMDoc! Please run gmdoc build from the command "
+                    "line to rebuild the gmdoc.json file."
+                ))
+
             print((
                 "You are trying to load a project created with an older version "
                 "of GMDoc! This requires rebuilding the gmdoc.json file."
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import os
+import re
+
+from .linkcheck import scan_file
+from .versions import hash_file
+
+
+SERVICE_WORKER = "sw.js"
+""" Name of the service worker file created by `write_service_worker`. """
+
+REGEX_CSS_URL = re.compile(r"url\(\s*[\"']?([^)\"']+)[\"']?\s*\)")
+
+PRECACHED_CSS_URLS = (".woff2",)
+""" Files referenced from stylesheets which are precached. Stylesheets refer
+to fonts in several formats, but browsers use only the first supported
+one. """
+
+SERVICE_WORKER_JS = """// Generated by GMDoc, do not edit!
+const MANIFEST = %(manifest)s;
+const CACHE = 'gmdoc-%(version)s';
+const PREFIX = 'gmdoc-';
+
+const base = self.registration.scope;
+
+function versioned(url, hash) {
+  return new URL(url + '?__gmdoc=' + hash, base).href;
+}
+
+function lookup(request) {
+  const url = new URL(request.url);
+  if (url.origin !== location.origin || !url.href.startsWith(base)) {
+    return null;
+  }
+  let path = url.pathname.substring(new URL(base).pathname.length);
+  if (path === '') {
+    path = 'index.html';
+  }
+  const hash = MANIFEST[decodeURIComponent(path)];
+  return hash ? versioned(path, hash) : null;
+}
+
+self.addEventListener('install', function (event) {
+  event.waitUntil((async function () {
+    const cache = await caches.open(CACHE);
+    await Promise.all(Object.keys(MANIFEST).map(async function (url) {
+      const key = versioned(url, MANIFEST[url]);
+      // Files with an unchanged hash are taken from older caches
+      let response = await caches.match(key);
+      if (!response) {
+        response = await fetch(new URL(url, base).href, { cache: 'no-cache' });
+        if (!response.ok) {
+          return;
+        }
+      }
+      await cache.put(key, response);
+    }));
+    await self.skipWaiting();
+  })());
+});
+
+self.addEventListener('activate', function (event) {
+  event.waitUntil((async function () {
+    const keys = await caches.keys();
+    await Promise.all(keys.filter(function (key) {
+      return key.startsWith(PREFIX) && key !== CACHE;
+    }).map(function (key) {
+      return caches.delete(key);
+    }));
+    await self.clients.claim();
+  })());
+});
+
+self.addEventListener('fetch', function (event) {
+  if (event.request.method !== 'GET') {
+    return;
+  }
+  const key = lookup(event.request);
+  if (!key) {
+    return;
+  }
+  event.respondWith(caches.open(CACHE).then(function (cache) {
+    return cache.match(key).then(function (response) {
+      return response || fetch(event.request);
+    });
+  }));
+});
+"""
+
+
+def write_service_worker(docs_dir, log=print):
+    """ Writes a service worker into `docs_dir`, which precaches all pages
+    and files they reference. Each file is versioned by a hash of its
+    content, so only modified files are downloaded again when the
+    documentation is updated. Returns the number of precached files. """
+    docs_dir = os.path.abspath(docs_dir)
+    files = set()
+
+    for root, _, names in os.walk(docs_dir):
+        for name in names:
+            if not name.endswith(".html"):
+                continue
+            fpath = os.path.join(root, name)
+            files.add(fpath)
+            for link in scan_file(fpath)[1]:
+                link = link.split("#", 1)[0].split("?", 1)[0]
+                if not link:
+                    continue
+                target = os.path.normpath(os.path.join(root, link))
+                if os.path.isfile(target):
+                    files.add(target)
+
+    for fpath in list(files):
+        if not fpath.endswith(".css"):
+            continue
+        with open(fpath, encoding="utf-8", errors="replace") as f:
+            css = f.read()
+        for url in REGEX_CSS_URL.findall(css):
+            url = url.split("#", 1)[0].split("?", 1)[0]
+            if not url.endswith(PRECACHED_CSS_URLS):
+                continue
+            target = os.path.normpath(os.path.join(os.path.dirname(fpath), url))
+            if os.path.isfile(target):
+                files.add(target)
+
+    manifest = {}
+    for fpath in sorted(files):
+        if not fpath.startswith(docs_dir + os.sep):
+            continue
+        url = os.path.relpath(fpath, docs_dir).replace(os.sep, "/")
+        manifest[url] = hash_file(fpath)[:16]
+
+    serialized = json.dumps(manifest, indent=2, sort_keys=True)
+    version = hashlib.sha256(serialized.encode("utf-8")).hexdigest()[:16]
+
+    log("Writing service worker with {} precached files".format(len(manifest)))
+    with open(os.path.join(docs_dir, SERVICE_WORKER), "w") as f:
+        f.write(SERVICE_WORKER_JS % {
+            "manifest": serialized,
+            "version": version,
+        })
+
+    return len(manifest)
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import shutil
+import threading
+import time
+from abc import ABC, abstractmethod
+
+
+class Output(ABC):
+    """ Base class of output backends, into which built documentation is
+    written. Paths are relative to the root of the output and always use
+    forward slashes. Each path can be written only once, since archives can
+    not replace files they already contain. """
+
+    def __init__(self):
+        self.names = set()
+
+    def _add(self, path):
+        """ Records a path which is about to be written, raises an exception
+        if it was already written. """
+        if path in self.names:
+            raise Exception("File {} was already written!".format(path))
+        self.names.add(path)
+
+    @abstractmethod
+    def write(self, path, content):
+        """ Writes a file. `content` can be either a string, which is encoded
+        as UTF-8, or bytes. """
+
+    def copy(self, src, path):
+        """ Copies a file from the filesystem into the output. """
+        with open(src, "rb") as f:
+            self.write(path, f.read())
+
+    def copytree(self, src_dir, path="", ignore=None):
+        """ Copies contents of a directory into the output. If given,
+        `ignore(dirpath, names)` returns names of files which are skipped,
+        like in `shutil.copytree`. """
+        for root, dirs, files in os.walk(src_dir):
+            dirs.sort()
+            ignored = ignore(root, files) if ignore else []
+            rel = os.path.relpath(root, src_dir).replace(os.sep, "/")
+            for file in sorted(files):
+                if file in ignored:
+                    continue
+                dst = file if rel == "." else rel + "/" + file
+                self.copy(os.path.join(root, file), path + "/" + dst if path else dst)
+
+    def close(self):
+        """ Finishes writing. No more files can be written afterwards. """
+        pass
+
+
+class DirectoryOutput(Output):
+    """ Writes files into a directory on the filesystem. """
+
+    def __init__(self, _root):
+        super(DirectoryOutput, self).__init__()
+        self.root = _root
+
+    def _path(self, path):
+        return os.path.join(self.root, *path.split("/"))
+
+    def clear(self):
+        """ Deletes the directory with everything in it. """
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def write(self, path, content):
+        self._add(path)
+        fpath = self._path(path)
+        os.makedirs(os.path.dirname(fpath), exist_ok=True)
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        with open(fpath, "wb") as f:
+            f.write(content)
+
+    def copy(self, src, path):
+        self._add(path)
+        fpath = self._path(path)
+        os.makedirs(os.path.dirname(fpath), exist_ok=True)
+        shutil.copy2(src, fpath)
+
+
+class MemoryOutput(Output):
+    """ Keeps written files in memory, in dictionary `files` of paths and
+    their contents as bytes. """
+
+    def __init__(self):
+        super(MemoryOutput, self).__init__()
+        self.files = {}
+
+    def write(self, path, content):
+        self._add(path)
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        self.files[path] = content
+
+
+class ArchiveOutput(Output):
+    """ Streams files into a ZIP or TAR archive, without writing them onto
+    the filesystem. The archive format is chosen by the extension of
+    `_fpath`: ".zip", ".tar", ".tar.gz" (".tgz"), ".tar.bz2" or ".tar.xz".
+    The archive is created when the first file is written.
+
+    All files get modification time `_mtime` (a timestamp), which defaults
+    to the time the archive is created. The Builder sets it to the date of
+    the build, so archives of unchanged projects are byte-identical. """
+
+    FORMATS = {
+        ".tar": "w",
+        ".tar.gz": "w:gz",
+        ".tgz": "w:gz",
+        ".tar.bz2": "w:bz2",
+        ".tar.xz": "w:xz",
+    }
+
+    def __init__(self, _fpath, _mtime=None):
+        super(ArchiveOutput, self).__init__()
+        self.fpath = _fpath
+        self.mtime = _mtime
+        self._zip = None
+        self._tar = None
+        self._gzip = None
+        self._file = None
+
+        lower = _fpath.lower()
+        if lower.endswith(".zip"):
+            self._mode = None
+            return
+
+        for ext, mode in self.FORMATS.items():
+            if lower.endswith(ext):
+                self._mode = mode
+                return
+
+        raise Exception("Unsupported archive format of {}!".format(_fpath))
+
+    def _open(self):
+        import gzip
+        import tarfile
+        import zipfile
+
+        if self._zip is not None or self._tar is not None:
+            return
+        if self.mtime is None:
+            self.mtime = time.time()
+        if self._mode is None:
+            self._zip = zipfile.ZipFile(self.fpath, "w", zipfile.ZIP_DEFLATED)
+        elif self._mode == "w:gz":
+            # Gzip headers contain a timestamp and the name of the file too
+            self._file = open(self.fpath, "wb")
+            self._gzip = gzip.GzipFile("", "wb", fileobj=self._file, mtime=int(self.mtime))
+            self._tar = tarfile.open(fileobj=self._gzip, mode="w")
+        else:
+            self._tar = tarfile.open(self.fpath, self._mode)
+
+    def write(self, path, content):
+        import tarfile
+        import zipfile
+
+        self._add(path)
+        self._open()
+
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+
+        if self._zip is not None:
+            # ZIP can not store dates before 1980
+            info = zipfile.ZipInfo(path, time.gmtime(max(self.mtime, 315532800))[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            self._zip.writestr(info, content)
+        else:
+            info = tarfile.TarInfo(path)
+            info.size = len(content)
+            info.mtime = int(self.mtime)
+            info.mode = 0o644
+            self._tar.addfile(info, io.BytesIO(content))
+
+    def close(self):
+        self._open()
+        if self._zip is not None:
+            self._zip.close()
+        else:
+            self._tar.close()
+            if self._gzip is not None:
+                self._gzip.close()
+                self._file.close()
+
+
+class QueuedOutput(Output):
+    """ Writes files into another output on a pool of `_jobs` background
+    threads, so writing overlaps with rendering. At most `_max_pending`
+    files wait to be written and further writes block until some of them
+    are done, which keeps memory bounded. Writes of the same path are
+    always done in the order of calls and with a single job, all files are.
+    Errors are raised by the next write or by `close`, which waits for all
+    files and closes the other output. """
+
+    def __init__(self, _output, _jobs=1, _max_pending=64):
+        from concurrent.futures import ThreadPoolExecutor
+
+        super(QueuedOutput, self).__init__()
+        self.output = _output
+        # A thread per executor, with each path assigned to one of them
+        self._executors = [ThreadPoolExecutor(max_workers=1) for _ in range(_jobs)]
+        self._slots = threading.BoundedSemaphore(_max_pending)
+        self._errors = []
+
+    def _run(self, func, *args):
+        try:
+            func(*args)
+        except Exception as e:
+            self._errors.append(e)
+        finally:
+            self._slots.release()
+
+    def _submit(self, path, func, *args):
+        if self._errors:
+            raise self._errors[0]
+        self._slots.acquire()
+        executor = self._executors[hash(path) % len(self._executors)]
+        executor.submit(self._run, func, *args)
+
+    def write(self, path, content):
+        self._submit(path, self.output.write, path, content)
+
+    def copy(self, src, path):
+        self._submit(path, self.output.copy, src, path)
+
+    def close(self):
+        for executor in self._executors:
+            executor.shutdown(wait=True)
+        self.output.close()
+        if self._errors:
+            raise self._errors[0]
+
@@ -1,29 +1,36 @@
 # -*- coding: utf-8 -*-
 import re
+import sys
 
 from .tokenizer import Token
 
 
 class Entity(object):
-    def __init__(self, _name="", _docs=None):
-        self.name = _name
+    # Projects have up to millions of entities, slots save their dicts
+    __slots__ = ("name", "parent", "docs", "at")
+
+    def __init__(self, _name="", _docs=None, _at=None):
+        self.name = sys.intern(_name) if _name else _name
         self.parent = None
         self.docs = _docs
+        self.at = _at
 
 
 class Macro(Entity):
-    pass
+    __slots__ = ()
 
 
 class Member(Entity):
-    pass
+    __slots__ = ()
 
 
 class Variable(Entity):
-    pass
+    __slots__ = ()
 
 
 class Scope(Entity):
+    __slots__ = ("children",)
+
     def __init__(self, **kwargs):
         super(Scope, self).__init__(**kwargs)
         self.children = []
@@ -59,57 +66,85 @@ class Scope(Entity):
 
 
 class Script(Scope):
-    pass
+    __slots__ = ("references",)
+
+    def __init__(self, **kwargs):
+        super(Script, self).__init__(**kwargs)
+        # Names referenced in the script, mapped to sorted tuples of names of
+        # functions they are referenced from ("" outside of functions)
+        self.references = {}
 
 
 class Function(Scope):
-    pass
+    __slots__ = ("args",)
+
+    def __init__(self, _args=None, **kwargs):
+        super(Function, self).__init__(**kwargs)
+        self.args = _args if _args else []
 
 
 class Constructor(Function):
-    pass
+    __slots__ = ("base",)
+
+    def __init__(self, _base=None, **kwargs):
+        super(Constructor, self).__init__(**kwargs)
+        # Name of the constructor it inherits from in code
+        self.base = _base
 
 
 class Enum(Scope):
-    pass
+    __slots__ = ()
 
 
 class Tag(object):
+    __slots__ = ("tag", "type", "name", "desc")
+
     def __init__(self, _tag, _type=None, _name=None, _desc=""):
-        self.tag = _tag
-        self.type = _type
-        self.name = _name
+        self.tag = sys.intern(_tag)
+        self.type = sys.intern(_type) if _type else _type
+        self.name = sys.intern(_name) if _name else _name
         self.desc = _desc
 
     def __repr__(self):
-        return str({
+        return str(self.serialize())
+
+    def serialize(self):
+        return {
             "tag": self.tag,
             "type": self.type,
             "name": self.name,
             "desc": self.desc,
-        })
+        }
 
 
 class Documentation(object):
+    # A flat list is smaller than a dictionary of lists and there are only a
+    # few tags to search through
+    __slots__ = ("tags",)
+
     def __init__(self):
-        self.tags = {}
+        self.tags = []
 
     def __repr__(self):
         return str(self.tags)
 
     def add_tag(self, tag):
-        tagname = tag.tag
-        if not tagname in self.tags:
-            self.tags[tagname] = []
-        self.tags[tagname].append(tag)
+        self.tags.append(tag)
+
+    def serialize(self):
+        # Tags are grouped by their name, in the order of their first use
+        order = {}
+        for t in self.tags:
+            order.setdefault(t.tag, len(order))
+        return [t.serialize() for t in sorted(self.tags, key=lambda t: order[t.tag])]
 
     def get_tag(self, tag, single=True):
-        tags = self.tags.get(tag, [])
         if single:
-            if len(tags) == 0:
-                return None
-            return tags[0]
-        return tags
+            for t in self.tags:
+                if t.tag == tag:
+                    return t
+            return None
+        return [t for t in self.tags if t.tag == tag]
 
     @staticmethod
     def from_string(_str):
@@ -170,6 +205,11 @@ class Documentation(object):
         return docs
 
 
+def is_documented(r):
+    """ Returns True if a page should be generated for a resource. """
+    return bool(r.docs) and not r.docs.get_tag("private")
+
+
 class Parser(object):
     def __init__(self, tokens):
         self.index = 0
@@ -222,33 +262,106 @@ class Parser(object):
         self.reset(mark)
         return None
 
+    def _previous(self):
+        """ Returns the last token before the current one, which is not a
+        whitespace or a comment. """
+        i = self.index - 1
+        while i >= 0:
+            token = self.tokens[i]
+            if not token.is_whitespace() and not token.is_comment():
+                return token
+            i -= 1
+        return None
+
+    def _skip_expression(self):
+        """ Skips tokens until a comma or a closing bracket which is not
+        nested in the skipped expression. """
+        depth = 0
+        while self.available():
+            token = self.peek()
+            if token.type in [Token.Type.BRACKET_LEFT, Token.Type.BRACKET_SQUARE_LEFT,
+                              Token.Type.BRACKET_CURLY_LEFT]:
+                depth += 1
+            elif token.type in [Token.Type.BRACKET_RIGHT, Token.Type.BRACKET_SQUARE_RIGHT,
+                                Token.Type.BRACKET_CURLY_RIGHT]:
+                if depth == 0:
+                    break
+                depth -= 1
+            elif token.type == Token.Type.COMMA and depth == 0:
+                break
+            self.next()
+
     def _parse_function(self, _method=False):
         # TODO: Mark and reset on errors
 
-        if not self.consume(_type=Token.Type.FUNCTION):
+        function = self.consume(_type=Token.Type.FUNCTION)
+        if not function:
             return None
 
         name = self.consume(_type=Token.Type.NAME)
         self.consume(_type=Token.Type.BRACKET_LEFT)
 
-        while self.consume(_type=Token.Type.NAME):
+        args = []
+        while True:
+            arg = self.consume(_type=Token.Type.NAME)
+            if not arg:
+                break
+            args.append(arg.value)
+            # Skip default values
+            if self.consume(_type=Token.Type.EQUALS):
+                self._skip_expression()
             self.consume(_type=Token.Type.COMMA)
 
         self.consume(_type=Token.Type.BRACKET_RIGHT)
 
+        # Inheritance, e.g. function Child() : Parent(...) constructor
+        base = None
+        if self.consume(_type=Token.Type.COLON):
+            base = self.consume(_type=Token.Type.NAME)
+            if self.consume(_type=Token.Type.BRACKET_LEFT):
+                while self.available():
+                    self._skip_expression()
+                    if not self.consume(_type=Token.Type.COMMA):
+                        break
+                self.consume(_type=Token.Type.BRACKET_RIGHT)
+
         constructor = self.consume(_type=Token.Type.CONSTRUCTOR)
 
         self.consume(_type=Token.Type.BRACKET_CURLY_LEFT)
 
         if constructor:
-            return Constructor(_name=name.value if name else None)
+            return Constructor(_name=name.value if name else None, _args=args, _at=function.at,
+                               _base=base.value if base else None)
 
-        return Function(_name=name.value if name else None)
+        return Function(_name=name.value if name else None, _args=args, _at=function.at)
 
     def parse(self, prefix=""):
-        script = Script()
+        script = Script(_at=0)
         current = script
+        # Blocks (if statements, loops, struct literals etc.) do not get their
+        # own nodes, only their nesting within the current scope is tracked
+        depth = 0
+        depths = []
         documentation = None
+        references = {}
+        callers = {}
+
+        def _get_caller(scope):
+            key = id(scope)
+            if key not in callers:
+                names = []
+                while scope:
+                    if isinstance(scope, Function) and scope.name:
+                        names.append(scope.name)
+                    scope = scope.parent
+                callers[key] = sys.intern(".".join(reversed(names)))
+            return callers[key]
+
+        def _add_reference(name, scope):
+            name = sys.intern(name)
+            if name not in references:
+                references[name] = set()
+            references[name].add(_get_caller(scope))
 
         # TODO: Error handling!
 
@@ -271,7 +384,7 @@ class Parser(object):
             elif token.type == Token.Type.MACRO:
                 self.next()
                 name = self.consume(_type=Token.Type.NAME)
-                macro = Macro(_name=name.value, _docs=documentation)
+                macro = Macro(_name=name.value, _docs=documentation, _at=token.at)
                 documentation = None
                 current.add_child(macro)
 
@@ -280,10 +393,12 @@ class Parser(object):
                 self.next()
                 name = self.consume(_type=Token.Type.NAME)
                 if self.consume(_type=Token.Type.BRACKET_CURLY_LEFT):
-                    enum = Enum(_name=name.value, _docs=documentation)
+                    enum = Enum(_name=name.value, _docs=documentation, _at=token.at)
                     documentation = None
                     current.add_child(enum)
                     current = enum
+                    depths.append(depth)
+                    depth = 0
 
             # Global variables
             elif token.type == Token.Type.GLOBAL:
@@ -291,12 +406,13 @@ class Parser(object):
                 self.consume(_type=Token.Type.DOT)
                 name = self.consume(_type=Token.Type.NAME)
                 variable = Variable(
-                    _name="global." + name.value, _docs=documentation)
+                    _name="global." + name.value, _docs=documentation, _at=token.at)
                 documentation = None
                 current.add_child(variable)
 
             # Variables and names
             elif token.type == Token.Type.NAME:
+                previous = self._previous()
                 self.next()
 
                 # Variable assignments
@@ -308,26 +424,35 @@ class Parser(object):
                         function.docs = documentation
                         documentation = None
                         if not function.name:
-                            function.name = token.value
+                            function.name = sys.intern(token.value)
+                            function.at = token.at
                         current.add_child(function)
                         current = function
+                        depths.append(depth)
+                        depth = 0
+                        if isinstance(function, Constructor) and function.base:
+                            _add_reference(function.base, function)
                         continue
 
                     # Other
-                    if isinstance(current, Constructor):
+                    if isinstance(current, Constructor) and depth == 0:
                         variable = Variable(
-                            _name=token.value, _docs=documentation)
+                            _name=token.value, _docs=documentation, _at=token.at)
                         documentation = None
                         current.add_child(variable)
                         continue
 
                 # Enum members
                 if isinstance(current, Enum):
-                    member = Member(_name=token.value, _docs=documentation)
+                    member = Member(_name=token.value, _docs=documentation, _at=token.at)
                     documentation = None
                     current.add_child(member)
                     continue
 
+                # References, except for members accessed with a dot
+                if not previous or previous.type != Token.Type.DOT:
+                    _add_reference(token.value, current)
+
             # Named functions
             elif token.type == Token.Type.FUNCTION:
                 function = self._parse_function()
@@ -336,20 +461,28 @@ class Parser(object):
                     documentation = None
                     current.add_child(function)
                     current = function
+                    depths.append(depth)
+                    depth = 0
+                    if isinstance(function, Constructor) and function.base:
+                        _add_reference(function.base, function)
 
-            # Other scopes
+            # Blocks
             elif token.type == Token.Type.BRACKET_CURLY_LEFT:
                 self.next()
-                scope = Scope()
-                current.add_child(scope)
-                current = scope
+                depth += 1
 
-            # Scope end
+            # Block or scope end
             elif token.type == Token.Type.BRACKET_CURLY_RIGHT:
                 self.next()
-                current = current.parent
+                if depth > 0:
+                    depth -= 1
+                elif current.parent:
+                    current = current.parent
+                    depth = depths.pop()
 
             else:
                 self.next()
 
+        script.references = {k: tuple(sorted(v)) for k, v in references.items()}
+
         return script
@@ -1,14 +1,33 @@
 # -*- coding: utf-8 -*-
 import os
 import re
+import threading
 
 import mistune
-from jinja2 import Template
 
+from .highlighter import highlight
+from .output import DirectoryOutput
 from .parser import *
 
 
-markdown = mistune.Markdown(escape=False)
+class Renderer(mistune.Renderer):
+    def block_code(self, code, lang=None):
+        if lang != "gml":
+            return super(Renderer, self).block_code(code, lang)
+        # No "lang-" prefix in the class, so Prism leaves the block alone
+        code = code.rstrip("\n")
+        return '<pre><code class="gml">{}\n</code></pre>\n'.format(highlight(code))
+
+
+_local = threading.local()
+
+
+def markdown(text):
+    """ Converts Markdown to HTML. Mistune's parser is stateful, so each
+    thread gets its own instance. """
+    if not hasattr(_local, "markdown"):
+        _local.markdown = mistune.Markdown(renderer=Renderer(escape=False))
+    return _local.markdown(text)
 
 
 def trim_code(code):
@@ -26,6 +45,27 @@ def add_bootstrap(code, table_class=""):
     return code
 
 
+TABLE_ROWS_VISIBLE = 100
+""" Number of rows of tables on generated pages which are rendered right
+away, the rest is rendered by main.js as the page is scrolled. """
+
+REGEX_TBODY = re.compile(r"<tbody>\n(.*?)</tbody>", re.DOTALL)
+REGEX_TR = re.compile(r"<tr>.*?</tr>\n", re.DOTALL)
+
+
+def defer_table_rows(code, visible=TABLE_ROWS_VISIBLE):
+    """ Moves rows of tables after the first `visible` ones into a template
+    at the end of the table's body, which browsers parse, but do not
+    render. """
+    def _defer(m):
+        rows = REGEX_TR.findall(m.group(1))
+        if len(rows) <= visible:
+            return m.group(0)
+        return '<tbody>\n{}<template class="deferred-rows">\n{}</template>\n</tbody>'.format(
+            "".join(rows[:visible]), "".join(rows[visible:]))
+    return REGEX_TBODY.sub(_defer, code)
+
+
 def make_menu(toc, path):
     counter = 0
 
@@ -66,8 +106,14 @@ def make_menu(toc, path):
             res += """\n<ul id="folder-{}"{}>\n""".format(
                 counter,
                 "" if isinpath else ' style="display: none;"')
+            if not isinpath:
+                # Browsers do not render contents of templates, main.js
+                # moves them into the folder when it is first expanded
+                res += "<template>\n"
             for a, b in v.get("pages", {}).items():
                 res += make_menu_item(a, b)
+            if not isinpath:
+                res += "</template>\n"
             res += "</ul>\n"
 
         res += "</li>\n"
@@ -79,18 +125,96 @@ def make_menu(toc, path):
     return menu
 
 
-def make_pages(meta, flattened, docs_src_dir="", docs_dir="", template="", datestr="", yearstr=""):
-    toc = meta.toc
-
-    flattened_index = 0
-    jinja_template = Template(template)
-
+def make_page_data(meta, datestr="", yearstr=""):
+    """ Returns template data shared by all pages. """
     data = meta.serialize()
     data["header"] = meta.title
     data["date"] = datestr
     data["year"] = yearstr
+    return data
+
+
+def make_page(meta, title, fpath, path, breadcrumb, link_prev=None, link_next=None,
+              docs_dir="", template=None, data={}, log=print, source=None, output=None):
+    """ Renders a single page into `output`, which defaults to a
+    DirectoryOutput of `docs_dir`. `path` and `breadcrumb` must already
+    include the page itself. If `source` is given, it is used instead of the
+    contents of the file at `fpath`. """
+    fname, fext = os.path.splitext(os.path.basename(fpath))
+
+    log("Writing page {}.html from {}".format(fname, fpath))
+
+    menu = make_menu(meta.toc, path)
+
+    # Make breadcrumb
+    content = """<nav aria-label="breadcrumb"><ol class="breadcrumb">"""
+    size = len(path)
+
+    for i in range(size):
+        if i == size - 1:
+            content += """<li class="breadcrumb-item active">{text}</li>""".format(
+                text=breadcrumb[i])
+        else:
+            content += """<li class="breadcrumb-item"><a href="{link}.html">{text}</a></li>""".format(
+                text=breadcrumb[i],
+                link=path[i])
+
+    content += "</nav></ol>\n"
+
+    # Append content
+    try:
+        if source is None:
+            with open(fpath) as f:
+                source = f.read()
+        if fext == ".md":
+            code = add_bootstrap(
+                trim_code(markdown(source)),
+                table_class="table-arguments" if path[0] == "ScriptingAPI" else "")
+            if path[0] == "ScriptingAPI":
+                code = defer_table_rows(code)
+            content += code
+        else:
+            content += source
+    except Exception as e:
+        log(e)
+        pass
+
+    fname_html = "{}.html".format(fname)
+
+    data = data.copy()
+    data["menu"] = menu
+    data["title"] = "{}: {}".format(meta.title, title)
+    data["content"] = content
+    data["page"] = fname_html
+    data["link_prev"] = link_prev if link_prev is not None else "#"
+    data["link_next"] = link_next if link_next is not None else "#"
+    data["prism"] = 'class="lang-' in content
+    fcontent = template.render(**data)
+
+    if output is None:
+        output = DirectoryOutput(docs_dir)
+    output.write(fname_html, fcontent)
+
+
+def make_pages(meta, flattened, docs_src_dir="", docs_dir="", template=None, datestr="", yearstr="", log=print, include=None, data=None, output=None, sources=None):
+    """ Renders all pages from the table of contents into `output`, which
+    defaults to a DirectoryOutput of `docs_dir`. If `include` is given,
+    only pages for which `include(path)` returns True are written. Template
+    data shared by all pages can be passed in `data`, otherwise it is made
+    using `make_page_data`. Contents of pages can be passed in a dictionary
+    `sources` of their absolute paths, instead of being read from the files.
+    Returns the number of pages in the table of contents. """
+    toc = meta.toc
+
+    flattened_index = 0
+
+    if data is None:
+        data = make_page_data(meta, datestr, yearstr)
 
-    def make_page(k, v, path, breadcrumb):
+    if output is None:
+        output = DirectoryOutput(docs_dir)
+
+    def _make_page(k, v, path, breadcrumb):
         nonlocal flattened_index
         link_prev = None if flattened_index == 0 else flattened[flattened_index - 1]
         # link_curr = flattened[flattened_index]
@@ -102,9 +226,7 @@ def make_pages(meta, flattened, docs_src_dir="", docs_dir="", template="", dates
         fpath = v["file"] if isfolder else v
         if not os.path.isabs(fpath):
             fpath = os.path.join(docs_src_dir, fpath)
-        fname, fext = os.path.splitext(os.path.basename(fpath))
-
-        print("Writing page {}.html from {}".format(fname, fpath))
+        fname, _ = os.path.splitext(os.path.basename(fpath))
 
         path = path.copy()
         path.append(fname)
@@ -112,57 +234,58 @@ def make_pages(meta, flattened, docs_src_dir="", docs_dir="", template="", dates
         breadcrumb = breadcrumb.copy()
         breadcrumb.append(k)
 
-        menu = make_menu(toc, path)
+        if include is None or include(path):
+            make_page(meta, k, fpath, path, breadcrumb, link_prev, link_next,
+                      docs_dir=docs_dir, template=template, data=data, log=log,
+                      source=sources.get(fpath) if sources else None,
+                      output=output)
 
-        # Make breadcrumb
-        content = """<nav aria-label="breadcrumb"><ol class="breadcrumb">"""
-        size = len(path)
+        if isfolder and "pages" in v:
+            for a, b in v["pages"].items():
+                _make_page(a, b, path, breadcrumb)
 
-        for i in range(size):
-            if i == size - 1:
-                content += """<li class="breadcrumb-item active">{text}</li>""".format(
-                    text=breadcrumb[i])
-            else:
-                content += """<li class="breadcrumb-item"><a href="{link}.html">{text}</a></li>""".format(
-                    text=breadcrumb[i],
-                    link=path[i])
+    for k, v in toc.items():
+        _make_page(k, v, [], [])
 
-        content += "</nav></ol>\n"
+    return flattened_index
 
-        # Append content
-        try:
-            with open(fpath) as f:
-                if fext == ".md":
-                    content += add_bootstrap(
-                        trim_code(markdown(f.read())),
-                        table_class="table-arguments" if path[0] == "ScriptingAPI" else "")
-                else:
-                    content += f.read()
-        except Exception as e:
-            print(e)
-            pass
-
-        fname_html = "{}.html".format(fname)
-
-        with open(os.path.join(docs_dir, fname_html), "w") as f:
-            data["menu"] = menu
-            data["title"] = "{}: {}".format(meta.title, k)
-            data["content"] = content
-            data["page"] = fname_html
-            data["link_prev"] = link_prev if link_prev is not None else "#"
-            data["link_next"] = link_next if link_next is not None else "#"
-            fcontent = jinja_template.render(**data)
-            f.write(fcontent)
 
-        if isfolder and "pages" in v:
-            for a, b in v["pages"].items():
-                make_page(a, b, path, breadcrumb)
+REGEX_MEMBER_LINK = re.compile(r"\]\(([A-Za-z_]\w*)\.([A-Za-z_]\w*)\.html\)")
 
-    for k, v in toc.items():
-        make_page(k, v, [], [])
+MEMBER_ANCHOR_PREFIX = "member-"
+""" Prefix of anchors of members' sections, so they do not clash with ids
+of elements of the template (e.g. `content`). """
+
+
+def inline_member_links(md):
+    """ Rewrites Markdown links to pages of members (`Parent.member.html`)
+    to their sections on the parent's page (`Parent.html#member-member`). """
+    return REGEX_MEMBER_LINK.sub(r"](\1.html#{}\2)".format(MEMBER_ANCHOR_PREFIX), md)
+
+
+USED_BY_LIMIT = 50
+""" Maximum number of places listed in the "Used by" table of a page. """
 
 
-def resource_to_markdown(r):
+def resource_to_markdown(r, used_by=None, inline_members=False, level=1, inherited=None,
+                         used_by_total=None):
+    """ Returns Markdown documentation of a resource or None if it should not
+    be documented. `used_by` is an optional list of tuples (file, caller,
+    link) of places where the resource is referenced, where `link` is the
+    name of the caller's page or None. At most `USED_BY_LIMIT` of them are
+    listed, followed by the number of the others, which is computed from
+    `used_by_total` if `used_by` does not contain all places.
+
+    With `inline_members` enabled, documented members of constructors and
+    enums are written as sections of their parent's page instead of having
+    their own pages, and all links to them are rewritten accordingly.
+    `level` is the level of the top heading, sections of members (level
+    greater than 1) get an anchor with their name prefixed with
+    `MEMBER_ANCHOR_PREFIX`.
+
+    `inherited` is an optional list of tuples (member, origin) of members
+    inherited by a constructor (see `Hierarchy.get_inherited`), which are
+    listed with its own properties and methods. """
     docs = r.docs
 
     if not docs:
@@ -173,11 +296,14 @@ def resource_to_markdown(r):
 
     content = []
 
+    h1 = "#" * level
+    h2 = "#" * (level + 1)
+
     def _add_basic(tag, title):
         _tag = tag if isinstance(tag, Tag) else docs.get_tag(tag)
         if _tag:
             content.append(
-                "## {}\n".format(title) +
+                "{} {}\n".format(h2, title) +
                 ("`{}` ".format(_tag.type) if _tag.type else "") +
                 _tag.desc)
 
@@ -190,7 +316,7 @@ def resource_to_markdown(r):
 
     # Name and type
     content.append(
-        "# {}".format(r.name) +
+        "{} {}{}".format(h1, '<a id="{}{}"></a>'.format(MEMBER_ANCHOR_PREFIX, r.name) if level > 1 else "", r.name) +
         (SPAN_DEPRECATED if _deprecated else "") +
         (SPAN_OBOSLETE if _obsolete else ""))
 
@@ -231,22 +357,29 @@ def resource_to_markdown(r):
     if isinstance(r, Enum):
         if r.children:
             members_header = (
-                "## Members\n"
+                h2 + " Members\n"
                 "| Name | Description |\n"
                 "| ---- | ----------- |\n"
             )
 
             members_row = "| [{name}](" + r.name + ".{name}.html) | {desc} |"
 
+            def __get_member_row(m):
+                if not is_documented(m):
+                    # Undocumented members do not have a page
+                    return "| {} | |".format(m.name)
+                _member = m.docs.get_tag("member") or m.docs.get_tag("desc")
+                return members_row.format(name=m.name, desc=_member.desc if _member else "")
+
             content.append(
-                members_header + "\n".join([members_row.format(name=c.name, desc=c.docs.get_tag("member").desc) for c in r.children]))
+                members_header + "\n".join([__get_member_row(c) for c in r.children]))
 
     # Function arguments
     if isinstance(r, Function):
         _params = docs.get_tag("param", single=False)
         if _params:
             arguments_header = (
-                "## Arguments\n"
+                h2 + " Arguments\n"
                 "| Name | Type | Description |\n"
                 "| ---- | ---- | ----------- |\n"
             )
@@ -270,34 +403,47 @@ def resource_to_markdown(r):
         def __get_desc(m):
             return m.docs.get_tag("desc").desc if m.docs.get_tag("desc") else ""
 
+        def __get_var_desc(p):
+            return p.docs.get_tag("var").desc if p.docs.get_tag("var") else __get_desc(p)
+
+        def __get_origin(origin):
+            return ' <small class="text-muted">from <a href="{name}.html">{name}</a></small>'.format(name=origin)
+
+        _inherited = inherited if inherited else []
+
         # Properties
-        _props = r.get_children(_type=Variable, _docs=True)
+        _props = [(p, r.name) for p in r.get_children(_type=Variable, _docs=True)] + \
+            [(p, o) for p, o in _inherited if isinstance(p, Variable)]
         if _props:
             properties_header = (
-                "## Properties\n"
+                h2 + " Properties\n"
                 "| Name | Description |\n"
                 "| ---- | ----------- |\n"
             )
 
-            properties_row = "| [{name}](" + \
-                r.name + ".{link}.html) | {desc} |"
+            properties_row = "| [{name}]({origin}.{link}.html){from_} | {desc} |"
 
             content.append(
-                properties_header + "\n".join([properties_row.format(name=__get_name(p), link=p.name, desc=p.docs.get_tag("var").desc) for p in _props]))
+                properties_header + "\n".join([properties_row.format(
+                    name=__get_name(p), origin=o, link=p.name, desc=__get_var_desc(p),
+                    from_=__get_origin(o) if o != r.name else "") for p, o in _props]))
 
         # Methods
-        _methods = r.get_children(_type=Function, _docs=True)
+        _methods = [(m, r.name) for m in r.get_children(_type=Function, _docs=True)] + \
+            [(m, o) for m, o in _inherited if isinstance(m, Function)]
         if _methods:
             methods_header = (
-                "## Methods\n"
+                h2 + " Methods\n"
                 "| Name | Description |\n"
                 "| ---- | ----------- |\n"
             )
 
-            methods_row = "| [{name}](" + r.name + ".{link}.html) | {desc} |"
+            methods_row = "| [{name}]({origin}.{link}.html){from_} | {desc} |"
 
             content.append(
-                methods_header + "\n".join([methods_row.format(name=__get_name(m), link=m.name, desc=__get_desc(m)) for m in _methods]))
+                methods_header + "\n".join([methods_row.format(
+                    name=__get_name(m), origin=o, link=m.name, desc=__get_desc(m),
+                    from_=__get_origin(o) if o != r.name else "") for m, o in _methods]))
 
     # Throws
     _throws = docs.get_tag("throws", single=False)
@@ -305,7 +451,7 @@ def resource_to_markdown(r):
         _throws.sort(key=lambda v: v.type)
         throws_item = "  * [{type}]({type}.html) - {desc}"
         content.append(
-            "## Throws\n" +
+            h2 + " Throws\n" +
             "\n".join([throws_item.format(type=t.type, desc=t.desc) for t in _throws]))
 
     # Example
@@ -318,10 +464,31 @@ def resource_to_markdown(r):
     _see = docs.get_tag("see", single=False)
     if _see:
         _see.sort(key=lambda v: v.desc)
-        cnt = "## See also\n"
+        cnt = h2 + " See also\n"
         cnt += ", ".join(["[{s}]({s}.html)".format(s=s.desc) for s in _see])
         content.append(cnt)
 
+    # Usages
+    if used_by:
+        used_by_header = (
+            h2 + " Used by\n"
+            "| Script | Function |\n"
+            "| ------ | -------- |\n"
+        )
+
+        def __get_caller(caller, link):
+            if not caller:
+                return "-"
+            return "[{}]({}.html)".format(caller, link) if link else caller
+
+        content.append(
+            used_by_header + "\n".join(
+                ["| `{}` | {} |".format(f, __get_caller(c, l)) for f, c, l in used_by[:USED_BY_LIMIT]]))
+
+        more = max(used_by_total or 0, len(used_by)) - min(len(used_by), USED_BY_LIMIT)
+        if more > 0:
+            content.append("And {} more place{}.".format(more, "s" if more > 1 else ""))
+
     # Source
     _add_basic("source", "Source")
 
@@ -331,4 +498,12 @@ def resource_to_markdown(r):
     # Obsolete
     _add_basic(_obsolete, "Obsolete")
 
-    return "\n\n".join(content)
+    # Sections of members
+    if inline_members and isinstance(r, (Constructor, Enum)):
+        _members = [resource_to_markdown(c, level=level + 2) for c in r.get_children(_docs=True)]
+        if _members:
+            content.append(h2 + " Member details")
+            content += _members
+
+    md = "\n\n".join(content)
+    return inline_member_links(md) if inline_members else md
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+import json
+import queue
+import re
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+MESSAGE_MAX_LENGTH = 255
+""" Maximum length of a rating message, same as in the rating form. """
+
+PAGE_MAX_LENGTH = 2048
+""" Maximum length of a rated page's URL. """
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ratings (
+    id INTEGER PRIMARY KEY,
+    page TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS page_stats (
+    page TEXT PRIMARY KEY,
+    likes INTEGER NOT NULL DEFAULT 0,
+    dislikes INTEGER NOT NULL DEFAULT 0,
+    messages INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+UPDATE_STATS = """
+INSERT INTO page_stats (page, likes, dislikes, messages) VALUES (?, ?, ?, ?)
+ON CONFLICT (page) DO UPDATE SET
+    likes = likes + excluded.likes,
+    dislikes = dislikes + excluded.dislikes,
+    messages = messages + excluded.messages
+"""
+
+
+class Rating(object):
+    def __init__(self, _page, _value, _message=""):
+        self.page = _page
+        self.value = _value
+        self.message = _message
+        self.created = time.time()
+        self.done = threading.Event()
+        self.error = None
+
+
+class RatingStore(object):
+    """ Stores ratings in an SQLite database at `_path`.
+
+    All writes are done by a single thread, which takes all ratings waiting
+    in a queue (at most `_batch_size`) and commits them in one transaction,
+    so under load a single fsync is shared by many ratings. Per-page stats
+    are updated in the same transaction. The database is in WAL mode, so
+    stats can be read while ratings are being written. """
+
+    def __init__(self, _path, _batch_size=256):
+        self.path = _path
+        self.batch_size = _batch_size
+        self._queue = queue.Queue(maxsize=_batch_size * 4)
+        self._local = threading.local()
+
+        conn = self._get_connection()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Durable enough in WAL mode, a power loss can undo only the last commits
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _get_connection(self):
+        """ Returns a connection of the calling thread. """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            rating = self._queue.get()
+            if rating is None:
+                break
+            batch = [rating]
+            while len(batch) < self.batch_size:
+                try:
+                    rating = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if rating is None:
+                    self._queue.put(None)
+                    break
+                batch.append(rating)
+            self._write(conn, batch)
+        conn.close()
+
+    def _write(self, conn, batch):
+        stats = {}
+        for r in batch:
+            s = stats.setdefault(r.page, [0, 0, 0])
+            s[0 if r.value > 0 else 1] += 1
+            s[2] += 1 if r.message else 0
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO ratings (page, value, message, created) VALUES (?, ?, ?, ?)",
+                    [(r.page, r.value, r.message, r.created) for r in batch])
+                conn.executemany(UPDATE_STATS, [(p,) + tuple(s) for p, s in stats.items()])
+        except sqlite3.Error as e:
+            for r in batch:
+                r.error = e
+        for r in batch:
+            r.done.set()
+
+    def add(self, page, value, message=""):
+        """ Stores a rating and returns once it is committed. """
+        rating = Rating(page, value, message)
+        self._queue.put(rating)
+        rating.done.wait()
+        if rating.error:
+            raise rating.error
+
+    def get_stats(self, page=None):
+        """ Returns a dictionary of per-page stats, optionally only for a
+        single page. """
+        sql = "SELECT page, likes, dislikes, messages FROM page_stats"
+        args = ()
+        if page is not None:
+            sql += " WHERE page = ?"
+            args = (page,)
+        return {
+            p: {"likes": l, "dislikes": d, "messages": m}
+            for p, l, d, m in self._get_connection().execute(sql, args)
+        }
+
+    def count(self):
+        """ Returns the number of stored ratings. """
+        return self._get_connection().execute("SELECT COUNT(*) FROM ratings").fetchone()[0]
+
+    def close(self):
+        """ Writes all queued ratings and stops the writer thread. """
+        self._queue.put(None)
+        self._writer.join()
+
+
+REGEX_BOUNDARY = re.compile(r"boundary=\"?([^\";]+)\"?")
+REGEX_FIELD_NAME = re.compile(rb"name=\"([^\"]*)\"")
+
+
+def parse_form(content_type, body):
+    """ Returns a dictionary of fields of a submitted form, which is either
+    URL encoded or multipart (like the one sent by the rating form). Files
+    in multipart forms are read as text fields. """
+    if content_type.startswith("multipart/form-data"):
+        m = REGEX_BOUNDARY.search(content_type)
+        if not m:
+            return {}
+        fields = {}
+        for part in body.split(b"--" + m.group(1).encode("latin-1")):
+            head, sep, value = part.partition(b"\r\n\r\n")
+            name = REGEX_FIELD_NAME.search(head)
+            if not sep or not name:
+                continue
+            if value.endswith(b"\r\n"):
+                value = value[:-2]
+            fields[name.group(1).decode("utf-8", "replace")] = value.decode("utf-8", "replace")
+        return fields
+    return {k: v[0] for k, v in parse_qs(body.decode("utf-8", "replace")).items()}
+
+
+class RatingHandler(BaseHTTPRequestHandler):
+    """ Accepts ratings sent by POST requests to any path and serves
+    per-page stats on GET /stats, optionally filtered by a `page` query
+    parameter. """
+
+    protocol_version = "HTTP/1.1"
+    # Responses are written in two parts, which would be delayed otherwise
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        self.server.log("{} - {}".format(self.address_string(), format % args))
+
+    def _send(self, code, body=b"", content_type="text/plain; charset=utf-8"):
+        self.send_response(code)
+        self.send_header("Access-Control-Allow-Origin", self.server.origin)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header("Access-Control-Allow-Origin", self.server.origin)
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path.rstrip("/") != "/stats":
+            self._send(404, b"Not found")
+            return
+        page = parse_qs(url.query).get("page", [None])[0]
+        stats = self.server.store.get_stats(page)
+        self._send(200, json.dumps(stats).encode("utf-8"), "application/json")
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0 or length > PAGE_MAX_LENGTH + MESSAGE_MAX_LENGTH * 4 + 4096:
+            self.close_connection = True
+            self._send(413, b"Request too large")
+            return
+
+        fields = parse_form(self.headers.get("Content-Type", ""), self.rfile.read(length))
+
+        # Ratings of the same page differing only by an anchor are merged
+        page = fields.get("page", "").split("#", 1)[0]
+        message = fields.get("message", "").strip()
+        try:
+            value = int(fields.get("like", ""))
+        except ValueError:
+            value = 0
+
+        if not page or len(page) > PAGE_MAX_LENGTH or value not in (-1, 1) \
+                or len(message) > MESSAGE_MAX_LENGTH:
+            self._send(400, b"Invalid rating")
+            return
+
+        try:
+            self.server.store.add(page, value, message)
+        except sqlite3.Error:
+            self._send(500, b"Could not store the rating")
+            return
+
+        self._send(200, b"OK")
+
+
+class RatingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Do not drop connections during traffic spikes
+    request_queue_size = 1024
+
+
+def make_server(store, host="localhost", port=8080, origin="*", log=print):
+    """ Returns a threaded HTTP server of the rating API, storing ratings
+    into a RatingStore. `origin` is sent in the Access-Control-Allow-Origin
+    header. """
+    server = RatingServer((host, port), RatingHandler)
+    server.store = store
+    server.origin = origin
+    server.log = log if log else (lambda *args: None)
+    return server
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import sqlite3
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from .exporter import entity_to_records
+from .parser import Parser, Tag
+from .tokenizer import Tokenizer, TokenizationError
+from .utils import get_lines
+
+
+SCHEMA_VERSION = 2
+""" Version of the database schema and of the parsed model stored in it,
+databases of other versions are created again from scratch. """
+
+SCHEMA = """
+CREATE TABLE files (
+    file TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE symbols (
+    id INTEGER PRIMARY KEY,
+    uid TEXT NOT NULL,
+    parent TEXT,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    file TEXT NOT NULL,
+    offset INTEGER,
+    line INTEGER
+);
+CREATE INDEX symbols_file ON symbols (file);
+CREATE INDEX symbols_name ON symbols (name);
+CREATE INDEX symbols_path ON symbols (path);
+CREATE INDEX symbols_kind ON symbols (kind);
+CREATE TABLE tags (
+    symbol INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    type TEXT,
+    name TEXT,
+    desc TEXT NOT NULL
+);
+CREATE INDEX tags_symbol ON tags (symbol);
+CREATE INDEX tags_tag ON tags (tag, name);
+CREATE INDEX tags_type ON tags (type);
+CREATE VIRTUAL TABLE search USING fts5 (
+    path, docs, tokenize = "unicode61 tokenchars '_'"
+);
+"""
+
+QUERY_CHUNK_SIZE = 500
+""" Maximum number of symbols whose tags are fetched in a single query. """
+
+
+class QueryError(Exception):
+    """ Raised for queries which SQLite can not run, e.g. full-text queries
+    with invalid syntax. """
+
+
+def get_default_path(project_dir):
+    """ Returns the path to the symbol database of a project, which is in the
+    system's temp directory. """
+    project_dir = os.path.abspath(project_dir)
+    return os.path.join(
+        tempfile.gettempdir(),
+        "gmdoc-symbols-{}.sqlite".format(hashlib.sha1(project_dir.encode("utf-8")).hexdigest()[:16]))
+
+
+class Symbol(object):
+    """ A documented or undocumented named entity of a project, as stored in
+    a SymbolStore. `path` is its dotted name (e.g. `Parent.member`), `id` is
+    the same as in `gmdoc export`. """
+
+    def __init__(self, _id, _parent, _kind, _name, _path, _file, _offset, _line, _tags=None):
+        self.id = _id
+        self.parent = _parent
+        self.kind = _kind
+        self.name = _name
+        self.path = _path
+        self.file = _file
+        self.offset = _offset
+        self.line = _line
+        self.tags = _tags if _tags else []
+
+    def __repr__(self):
+        desc = next((t.desc for t in self.tags if t.tag == "desc"), "")
+        return "{}:{}: {} {}{}".format(
+            self.file, self.line, self.kind, self.path,
+            " - " + desc.split("\n", 1)[0] if desc else "")
+
+    def get_tag(self, tag, single=True):
+        tags = [t for t in self.tags if t.tag == tag]
+        if single:
+            return tags[0] if tags else None
+        return tags
+
+    def serialize(self):
+        return {
+            "id": self.id,
+            "parent": self.parent,
+            "kind": self.kind,
+            "name": self.name,
+            "path": self.path,
+            "file": self.file,
+            "offset": self.offset,
+            "line": self.line,
+            "docs": [t.serialize() for t in self.tags] if self.tags else None,
+        }
+
+
+def _parse_file(args):
+    """ Parses a script and returns a list of its records (see
+    `entity_to_records`) with line numbers added, or None on syntax errors. """
+    fpath, file = args
+    with open(fpath) as f:
+        code = f.read()
+    try:
+        script = Parser(Tokenizer().tokenize(code)).parse()
+    except TokenizationError:
+        return None
+    script.name = os.path.basename(fpath)
+
+    records = list(entity_to_records(script, file))
+    for r, line in zip(records, get_lines(code, [r["offset"] or 0 for r in records])):
+        r["line"] = line
+    return records
+
+
+class SymbolStore(object):
+    """ Parsed documentation of a project stored in an SQLite database at
+    `_path`, with a full-text index of names and documentation.
+
+    `update` parses only scripts which were added or modified since the
+    last update, so it is cheap to call before every query. Queries never
+    parse anything. """
+
+    def __init__(self, _path):
+        self.path = _path
+        self._conn = self._connect()
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            if version:
+                # Made by another version of GMDoc, start from scratch
+                self._conn.close()
+                for suffix in ["", "-wal", "-shm"]:
+                    if os.path.exists(_path + suffix):
+                        os.remove(_path + suffix)
+                self._conn = self._connect()
+            self._conn.executescript(SCHEMA)
+            self._conn.execute("PRAGMA user_version = {}".format(SCHEMA_VERSION))
+            self._conn.commit()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def close(self):
+        self._conn.close()
+
+    def _remove(self, file):
+        ids = "SELECT id FROM symbols WHERE file = ?"
+        self._conn.execute("DELETE FROM search WHERE rowid IN ({})".format(ids), (file,))
+        self._conn.execute("DELETE FROM tags WHERE symbol IN ({})".format(ids), (file,))
+        self._conn.execute("DELETE FROM symbols WHERE file = ?", (file,))
+        self._conn.execute("DELETE FROM files WHERE file = ?", (file,))
+
+    def _insert(self, file, key, records):
+        self._conn.execute("INSERT INTO files VALUES (?, ?, ?)", (file, key[0], key[1]))
+        for r in records or []:
+            path = r["id"].split("#", 1)[1] if "#" in r["id"] else r["name"]
+            cursor = self._conn.execute(
+                "INSERT INTO symbols (uid, parent, kind, name, path, file, offset, line) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (r["id"], r["parent"], r["kind"], r["name"], path, r["file"], r["offset"], r["line"]))
+            symbol = cursor.lastrowid
+            docs = r["docs"] or []
+            self._conn.executemany(
+                "INSERT INTO tags VALUES (?, ?, ?, ?, ?)",
+                [(symbol, t["tag"], t["type"], t["name"], t["desc"]) for t in docs])
+            self._conn.execute(
+                "INSERT INTO search (rowid, path, docs) VALUES (?, ?, ?)",
+                (symbol, path, "\n".join(
+                    " ".join(v for v in [t["type"], t["name"], t["desc"]] if v) for t in docs)))
+
+    def update(self, project_dir, prefix, jobs=None, log=print):
+        """ Brings the store up to date with scripts of a project, parsing
+        added and modified scripts on a pool of `jobs` processes (defaults to
+        the number of CPUs). Returns the number of parsed scripts. """
+        from .builder import find_scripts
+
+        log = log if log else (lambda *args: None)
+
+        stored = {
+            file: (mtime_ns, size)
+            for file, mtime_ns, size in self._conn.execute("SELECT file, mtime_ns, size FROM files")
+        }
+
+        found = set()
+        todo = []
+        for fpath in find_scripts(project_dir, prefix):
+            file = os.path.relpath(fpath, project_dir).replace(os.sep, "/")
+            found.add(file)
+            stat = os.stat(fpath)
+            key = (stat.st_mtime_ns, stat.st_size)
+            if stored.get(file) != key:
+                todo.append((fpath, file, key))
+
+        removed = [f for f in stored if f not in found]
+        if not todo and not removed:
+            return 0
+
+        log("Indexing {} of {} scripts".format(len(todo), len(found)))
+
+        args = [(fpath, file) for fpath, file, _ in todo]
+        if len(todo) > 1 and (jobs or os.cpu_count() or 1) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                parsed = list(executor.map(_parse_file, args, chunksize=max(1, len(todo) // 64)))
+        else:
+            parsed = [_parse_file(a) for a in args]
+
+        with self._conn:
+            for file in removed:
+                self._remove(file)
+            for (fpath, file, key), records in zip(todo, parsed):
+                if records is None:
+                    log("Could not parse {}".format(fpath))
+                self._remove(file)
+                self._insert(file, key, records)
+
+        return len(todo)
+
+    def query(self, text=None, kind=None, name=None, tag=None, tag_type=None, tag_name=None,
+              file=None, limit=None):
+        """ Returns a list of Symbols matching all given conditions:
+          * `text` - A full-text query (FTS5 syntax) over dotted names and
+            documentation. Results are then ordered by relevance, otherwise
+            by name.
+          * `kind` - Kind of the symbol, e.g. "function" or "enum".
+          * `name` - Dotted name of the symbol, can contain wildcards * and ?.
+          * `tag` - Name of a tag the symbol is documented with. The symbol
+            must have a tag matching all of `tag`, `tag_type` and `tag_name`,
+            e.g. tag "param" with name "_surface" or tag "throws" with type
+            "MyError".
+          * `file` - Path to the script, relative to the project directory.
+
+        Raises QueryError if the full-text query is not valid.
+        """
+        sql = "SELECT s.id, s.uid, s.parent, s.kind, s.name, s.path, s.file, s.offset, s.line FROM symbols s"
+        where = []
+        args = []
+
+        if text:
+            sql += " JOIN search ON search.rowid = s.id"
+            where.append("search MATCH ?")
+            args.append(text)
+
+        if kind:
+            where.append("s.kind = ?")
+            args.append(kind)
+
+        if name:
+            where.append("s.path GLOB ?")
+            args.append(name)
+
+        if file:
+            where.append("s.file = ?")
+            args.append(file)
+
+        if tag or tag_type or tag_name:
+            conditions = []
+            for column, value in [("tag", tag), ("type", tag_type), ("name", tag_name)]:
+                if value:
+                    conditions.append("{} = ?".format(column))
+                    args.append(value)
+            where.append("s.id IN (SELECT symbol FROM tags WHERE {})".format(" AND ".join(conditions)))
+
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+
+        sql += " ORDER BY search.rank" if text else " ORDER BY s.path, s.file"
+
+        if limit:
+            sql += " LIMIT ?"
+            args.append(limit)
+
+        symbols = {}
+        try:
+            for row in self._conn.execute(sql, args):
+                symbols[row[0]] = Symbol(*row[1:])
+        except sqlite3.OperationalError as e:
+            raise QueryError(str(e))
+
+        ids = list(symbols)
+        for i in range(0, len(ids), QUERY_CHUNK_SIZE):
+            chunk = ids[i:i + QUERY_CHUNK_SIZE]
+            for symbol, _tag, _type, _name, _desc in self._conn.execute(
+                    "SELECT symbol, tag, type, name, desc FROM tags WHERE symbol IN ({}) ORDER BY rowid".format(
+                        ", ".join("?" * len(chunk))), chunk):
+                symbols[symbol].tags.append(Tag(_tag, _type, _name, _desc))
+
+        return list(symbols.values())
+
+    def count(self):
+        """ Returns the number of stored symbols. """
+        return self._conn.execute("SELECT COUNT(*) FROM symbols").fetchone()[0]
@@ -1,12 +1,11 @@
 # -*- coding: utf-8 -*-
-import datetime
+import json
 import os
 import sys
 
+from .builder import Builder, iter_resources
+from .exporter import entity_to_records, write_jsonl
 from .meta import Meta
-from .parser import Parser, Constructor, Enum
-from .printer import resource_to_markdown, make_pages
-from .tokenizer import Tokenizer
 from .utils import *
 
 
@@ -26,9 +25,30 @@ class HelpTarget(Target):
     MESSAGE = (
         "Usage: gmdoc TARGET\n"
         "\n"
-        "  TARGET - init  - Initialize gmdoc in the current directory.\n"
-        "         - build - Build documentation.\n"
-        "         - help  - Display this message.\n"
+        "  TARGET - init          - Initialize gmdoc in the current directory.\n"
+        "         - build         - Build documentation.\n"
+        "                           Usage: gmdoc build [--streaming] [--optimize-assets]\n"
+        "                                              [--check-links] [--offline]\n"
+        "                                              [--incremental]\n"
+        "                                              [--version VERSION]\n"
+        "                                              [--archive FILE | OUTPUT_DIR]\n"
+        "         - build-all     - Build documentation of multiple projects.\n"
+        "                           Usage: gmdoc build-all MANIFEST\n"
+        "         - check         - Check documentation comments without building.\n"
+        "                           Usage: gmdoc check [--format text|jsonl] [--no-cache]\n"
+        "         - check-links   - Check links in built documentation.\n"
+        "                           Usage: gmdoc check-links [DOCS_DIR]\n"
+        "         - export        - Export parsed documentation.\n"
+        "                           Usage: gmdoc export [--format jsonl] [FILE]\n"
+        "         - query         - Search parsed documentation.\n"
+        "                           Usage: gmdoc query [--kind KIND] [--name NAME] [--tag TAG]\n"
+        "                                              [--tag-type TYPE] [--tag-name NAME]\n"
+        "                                              [--file FILE] [--limit N] [--db FILE]\n"
+        "                                              [--format text|jsonl] [TEXT]\n"
+        "         - rating-server - Run a server of the page rating API.\n"
+        "                           Usage: gmdoc rating-server [--host HOST] [--port PORT]\n"
+        "                                                      [--db FILE] [--origin ORIGIN]\n"
+        "         - help          - Display this message.\n"
     )
 
     def execute(self, *args, **kwargs):
@@ -58,141 +78,270 @@ class InitTarget(Target):
                     f.write(cnt)
 
 
-class BuildTarget(Target):
-    def flatten_toc(self, toc):
-        flattened = []
-
-        def get_name(v):
-            return os.path.splitext(os.path.basename(v))[0] + ".html"
+class ExportTarget(Target):
+    FORMATS = ["jsonl"]
 
-        for _, v in toc.items():
-            if isinstance(v, dict):
-                flattened.append(get_name(v["file"]))
-                flattened += self.flatten_toc(v.get("pages", {}))
+    def execute(self, *args, **kwargs):
+        _format = "jsonl"
+        out = None
+
+        argv = sys.argv[2:]
+        while argv:
+            arg = argv.pop(0)
+            if arg == "--format":
+                _format = argv.pop(0) if argv else ""
             else:
-                flattened.append(get_name(v))
-
-        return flattened
-
-    def parse_resources(self, prefix):
-        parsed = []
-
-        for root, _, files in os.walk(self.project_dir):
-            for file in files:
-                if not file.startswith(prefix):
-                    continue
-                if file[-4:] != ".gml":
-                    continue
-                fpath = os.path.join(root, file)
-                print("Parsing", fpath)
-
-                with open(fpath) as f:
-                    tokenizer = Tokenizer()
-                    tokens = tokenizer.tokenize(f.read())
-                    parser = Parser(tokens)
-                    scope = parser.parse()
-                    scope.name = file
-                    parsed.append(scope)
-
-        return parsed
-
-    def flatten_resources(self, parsed):
-        resources = []
-        for p in parsed:
-            for c in p.children:
-                resources.append(c)
-        resources.sort(key=lambda r: r.name)
-        return resources
+                out = arg
+
+        if _format not in ExportTarget.FORMATS:
+            raise Exception("Unsupported export format {}!".format(_format))
+
+        def _log(*args):
+            print(*args, file=sys.stderr)
+
+        meta = Meta.load(self.meta_path)
+
+        f = open(out, "w") if out else sys.stdout
+        try:
+            for fpath, script in iter_resources(self.project_dir, meta.prefix, log=_log):
+                file = os.path.relpath(fpath, self.project_dir).replace(os.sep, "/")
+                write_jsonl(entity_to_records(script, file), f)
+                f.flush()
+        except BrokenPipeError:
+            # The consumer stopped reading (e.g. `gmdoc export | head`),
+            # remaining output goes nowhere, so flushing it at exit does not
+            # fail again
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, sys.stdout.fileno())
+            exit(1)
+        finally:
+            if out:
+                f.close()
 
+
+class BuildTarget(Target):
+    def execute(self, *args, **kwargs):
+        docs_dir = None
+        archive = None
+        options = {"interactive": True}
+        argv = sys.argv[2:]
+        while argv:
+            arg = argv.pop(0)
+            if arg == "--version":
+                options["version"] = argv.pop(0) if argv else None
+            elif arg == "--streaming":
+                options["streaming"] = True
+            elif arg == "--optimize-assets":
+                options["optimize_assets"] = True
+            elif arg == "--archive":
+                archive = argv.pop(0) if argv else None
+            elif arg == "--offline":
+                options["offline"] = True
+            elif arg == "--check-links":
+                options["check_links"] = True
+            elif arg == "--incremental":
+                options["incremental"] = True
+            else:
+                docs_dir = arg
+        if archive:
+            from .output import ArchiveOutput
+            options["output"] = ArchiveOutput(archive)
+        builder = Builder(self.gmdoc_dir)
+        result = builder.build(self.project_dir, docs_dir, options)
+        if result.broken_links is not None:
+            from .linkcheck import print_report
+            print_report(result.broken_links)
+            if result.broken_links:
+                exit(1)
+
+
+class CheckLinksTarget(Target):
     def execute(self, *args, **kwargs):
+        from .linkcheck import check_links, print_report
+
         if len(sys.argv) > 2:
             docs_dir = sys.argv[2]
         else:
             docs_dir = os.path.join(self.project_dir, "docs_build")
-            os.makedirs(docs_dir, exist_ok=True)
+        print("Checking links in {}".format(docs_dir))
+        broken = check_links(docs_dir)
+        print_report(broken)
+        if broken:
+            exit(1)
+
+
+class BuildAllTarget(Target):
+    """ Builds documentation of all projects listed in a manifest file:
+
+    ```json
+    {
+      "jobs": 4,
+      "projects": [
+        "path/to/project",
+        { "project": "path/to/other_project", "out": "path/to/output" }
+      ]
+    }
+    ```
+
+    Relative paths are relative to the manifest's directory.
+    """
+
+    def execute(self, *args, **kwargs):
+        if len(sys.argv) < 3:
+            raise Exception("MANIFEST not defined!")
+
+        manifest_path = os.path.abspath(sys.argv[2])
+        manifest_dir = os.path.dirname(manifest_path)
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+
+        if isinstance(manifest, list):
+            manifest = {"projects": manifest}
+
+        projects = []
+        for p in manifest.get("projects", []):
+            if not isinstance(p, dict):
+                p = {"project": p}
+            project_dir = os.path.join(manifest_dir, p["project"])
+            out_dir = os.path.join(manifest_dir, p["out"]) if p.get("out") else None
+            projects.append((project_dir, out_dir))
+
+        builder = Builder(self.gmdoc_dir, log=None)
+        results = builder.build_all(projects, jobs=manifest.get("jobs"))
+
+        failed = 0
+        for (project_dir, _), result in zip(projects, results):
+            if isinstance(result, Exception):
+                failed += 1
+                print("FAILED {}: {}".format(project_dir, result))
+            else:
+                print("Built {} ({} pages in {:.2f}s)".format(
+                    project_dir, result.pages, result.time))
+
+        if failed:
+            raise Exception("{} of {} projects failed to build!".format(
+                failed, len(projects)))
+
+
+class RatingServerTarget(Target):
+    def execute(self, *args, **kwargs):
+        from .rating import RatingStore, make_server
+
+        host = "localhost"
+        port = 8080
+        db = os.path.join(self.project_dir, "ratings.sqlite")
+        origin = "*"
+
+        argv = sys.argv[2:]
+        while argv:
+            arg = argv.pop(0)
+            if arg == "--host":
+                host = argv.pop(0) if argv else host
+            elif arg == "--port":
+                port = int(argv.pop(0)) if argv else port
+            elif arg == "--db":
+                db = argv.pop(0) if argv else db
+            elif arg == "--origin":
+                origin = argv.pop(0) if argv else origin
+            else:
+                raise Exception("Unknown argument {}!".format(arg))
+
+        store = RatingStore(db)
+        server = make_server(store, host, port, origin)
+        print("Serving page rating API on http://{}:{}, storing ratings into {}".format(
+            host, port, db))
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            store.close()
+
+
+class CheckTarget(Target):
+    FORMATS = ["text", "jsonl"]
+
+    def execute(self, *args, **kwargs):
+        from .checker import check_project
+
+        _format = "text"
+        cache = True
+
+        argv = sys.argv[2:]
+        while argv:
+            arg = argv.pop(0)
+            if arg == "--format":
+                _format = argv.pop(0) if argv else ""
+            elif arg == "--no-cache":
+                cache = False
+            else:
+                raise Exception("Unknown argument {}!".format(arg))
+
+        if _format not in CheckTarget.FORMATS:
+            raise Exception("Unsupported output format {}!".format(_format))
+
+        def _log(*args):
+            print(*args, file=sys.stderr)
 
-        print("Loading meta")
         meta = Meta.load(self.meta_path)
+        problems = check_project(
+            self.project_dir, meta.prefix, cache_path=None if cache else "", log=_log)
 
-        prefix = meta.prefix
-        toc = meta.toc
-        _now = datetime.datetime.now()
-        datestr = _now.strftime("%B %d, %Y")
-        yearstr = _now.strftime("%Y")
+        if _format == "jsonl":
+            write_jsonl((p.serialize() for p in problems), sys.stdout)
+        else:
+            for p in problems:
+                print(p)
 
+        _log("Found {} problem{}".format(len(problems), "" if len(problems) == 1 else "s"))
+        if problems:
+            exit(1)
+
+
+class QueryTarget(Target):
+    FORMATS = ["text", "jsonl"]
+
+    def execute(self, *args, **kwargs):
+        from .symbols import QueryError, SymbolStore, get_default_path
+
+        _format = "text"
+        db = None
+        query = {}
+
+        argv = sys.argv[2:]
+        while argv:
+            arg = argv.pop(0)
+            if arg == "--format":
+                _format = argv.pop(0) if argv else ""
+            elif arg == "--db":
+                db = argv.pop(0) if argv else db
+            elif arg == "--limit":
+                query["limit"] = int(argv.pop(0)) if argv else None
+            elif arg in ["--kind", "--name", "--tag", "--tag-type", "--tag-name", "--file"]:
+                query[arg[2:].replace("-", "_")] = argv.pop(0) if argv else None
+            elif arg.startswith("--"):
+                raise Exception("Unknown argument {}!".format(arg))
+            else:
+                query["text"] = arg
+
+        if _format not in QueryTarget.FORMATS:
+            raise Exception("Unsupported output format {}!".format(_format))
+
+        def _log(*args):
+            print(*args, file=sys.stderr)
+
+        meta = Meta.load(self.meta_path)
+        store = SymbolStore(db if db else get_default_path(self.project_dir))
         try:
-            print("Deleting {}".format(docs_dir))
-            shutil.rmtree(docs_dir)
-        except:
-            pass
-
-        print("Copying resources from {} to {}".format(
-            self.template_dir, docs_dir))
-        shutil.copytree(self.template_dir, docs_dir)
-
-        print("Loading template")
-        with open(os.path.join(self.template_dir, "index.html")) as f:
-            template = f.read()
-
-        print("Parsing scripting API documentation")
-        parsed = self.parse_resources(prefix)
-        resources = self.flatten_resources(parsed)
-
-        out_dir = os.path.join(self.docs_src_dir, "ScriptingAPI")
-        os.makedirs(out_dir, exist_ok=True)
-
-        scripting_api_toc = {
-            "file": "ScriptingAPI.md",
-            "pages": {}
-        }
-
-        for r in resources:
-            name = r.name
-
-            md = resource_to_markdown(r)
-            if md is None:
-                print("Skipping {} of type {}".format(r.name, type(r).__name__))
-                continue
-
-            print("Generating Markdown for", name)
-            fname = os.path.abspath("{}/{}.md".format(out_dir, name))
-            with open(fname, "w") as f:
-                f.write(md)
-
-            scripting_api_toc["pages"][name] = {
-                "file": fname,
-                "deprecated": True if r.docs.get_tag("deprecated") else False,
-                "obsolete": True if r.docs.get_tag("obsolete") else False
-            }
-
-            if isinstance(r, (Constructor, Enum)):
-                children = r.get_children(_docs=True)
-                if children:
-                    children_toc = {}
-                    for c in children:
-                        md = resource_to_markdown(c)
-                        if md is None:
-                            print("Skipping {}.{} of type {}".format(r.name, c.name, type(c).__name__))
-                            continue
-                        print("Generating Markdown for {}.{}".format(r.name, c.name))
-                        cfname = os.path.abspath("{}/{}.{}.md".format(out_dir, r.name, c.name))
-                        with open(cfname, "w") as f:
-                            f.write(md)
-                        children_toc[c.name] = {
-                            "file": cfname,
-                            "deprecated": True if c.docs.get_tag("deprecated") else False,
-                            "obsolete": True if c.docs.get_tag("obsolete") else False
-                        }
-                    scripting_api_toc["pages"][name]["pages"] = children_toc
-
-        toc["Scripting API"] = scripting_api_toc
-
-        make_pages(
-            meta,
-            self.flatten_toc(toc),
-            docs_src_dir=self.docs_src_dir,
-            docs_dir=docs_dir,
-            template=template,
-            datestr=datestr,
-            yearstr=yearstr
-        )
+            store.update(self.project_dir, meta.prefix, log=_log)
+            symbols = store.query(**query)
+        except QueryError as e:
+            print("Invalid query: {}".format(e), file=sys.stderr)
+            exit(1)
+        finally:
+            store.close()
+
+        if _format == "jsonl":
+            write_jsonl((s.serialize() for s in symbols), sys.stdout)
+        else:
+            for s in symbols:
+                print(s)
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
+import os
 import re
+from array import array
 from enum import Enum, auto
 
 
@@ -87,6 +89,8 @@ class Token(object):
         WHILE = auto()
         WHITESPACE = auto()
 
+    __slots__ = ("value", "type", "at", "len")
+
     def __init__(self, _value: str, _type: int, _at: int, _len: int):
         self.value = _value
         self.type = _type
@@ -179,12 +183,34 @@ DELIMITERS = {
     r"~": Token.Type.TILDE,
 }
 
+DELIMITER_CHARS = {re.sub(r"^\\", "", k): v for k, v in DELIMITERS.items()}
+""" DELIMITERS keyed by the actual characters instead of regular expressions. """
+
 REGEX_CACHE = {}
 
+REGEX_STRING_END = re.compile(r"[\"\\\n]")
+""" Characters that end or escape a part of a regular string. """
+
+PATTERNS = [
+    (r"#macro\b", Token.Type.MACRO),
+    (r"\/{3}[^\n]*", Token.Type.DOCUMENTATION),
+    (r"\/\/+[^\n]*", Token.Type.COMMENT),
+    (r"[a-z_][a-z0-9_]*", Token.Type.NAME),
+    (r"\d+\.?\d*|\.\d+", Token.Type.NUMBER),
+    (r"\$[a-f0-9]+", Token.Type.NUMBER),
+    (r"\r?\n", Token.Type.NEWLINE),
+    (r"\s+", Token.Type.WHITESPACE),
+]
+""" Regular expressions for tokens which are not keywords, block comments,
+strings or delimiters, in the order they are tried. None of them can
+backtrack more than a constant number of characters. """
+
+
 class Tokenizer(object):
     def tokenize(self, _code: str):
         tokens = []
         at = 0
+        size = len(_code)
 
         def get_token(_regex, _type):
             if _regex in REGEX_CACHE:
@@ -193,52 +219,189 @@ class Tokenizer(object):
                 r = re.compile(_regex, flags=re.IGNORECASE)
                 REGEX_CACHE[_regex] = r
 
-            m = r.match(_code)
+            m = r.match(_code, at)
             if m:
-                _start = m.start(0)
-                _len = m.end(0)
-                token = Token(m.group(0), _type, at + _start, _len - _start)
-                return token
+                return Token(m.group(0), _type, at, m.end(0) - at)
             return None
 
-        while _code:
+        def get_block_comment():
+            if not _code.startswith("/*", at):
+                return None
+            end = _code.find("*/", at + 2)
+            # Unterminated comments span until the end of the code
+            end = size if end == -1 else end + 2
+            return Token(_code[at:end], Token.Type.COMMENT, at, end - at)
+
+        def get_string():
+            verbatim = _code.startswith("@\"", at)
+            if not verbatim and not _code.startswith("\"", at):
+                return None
+            start = at + 2 if verbatim else at + 1
+            if verbatim:
+                # Verbatim strings do not have escape sequences and can span
+                # multiple lines
+                end = _code.find("\"", start)
+            else:
+                end = -1
+                while True:
+                    m = REGEX_STRING_END.search(_code, start)
+                    if not m or m.group(0) == "\n":
+                        break
+                    if m.group(0) == "\\":
+                        start = m.end(0) + 1
+                        continue
+                    end = m.start(0)
+                    break
+            if end == -1:
+                raise TokenizationError(
+                    "Unterminated string at {}!".format(at))
+            end += 1
+            return Token(_code[at:end], Token.Type.STRING, at, end - at)
+
+        while at < size:
             token = None
 
-            for k, v in RESERVED.items():
-                token = get_token(r"^" + k + r"\b", v)
+            for regex, _type in PATTERNS:
+                token = get_token(regex, _type)
                 if token:
                     break
 
+            if token and token.type == Token.Type.NAME:
+                # Keywords are names reserved by the language
+                keyword = RESERVED.get(token.value.lower())
+                if keyword:
+                    token.type = keyword
+
             if not token:
-                token = (get_token(r"^#macro\b", Token.Type.MACRO) or
-                         get_token(r"^\/{3}[^\n]*", Token.Type.DOCUMENTATION) or
-                         get_token(r"^\/\*[\s\S]*\*\/", Token.Type.COMMENT) or
-                         get_token(r"^\/\/+[^\n]*", Token.Type.COMMENT) or
-                         get_token(r"^[a-z_][a-z0-9_]*", Token.Type.NAME) or
-                         get_token(r"^\d+\.?\d*|\.\d+", Token.Type.NUMBER) or
-                         get_token(r"^\$[a-f0-9]+", Token.Type.NUMBER) or
-                         get_token(r"^@\"(\\\"|[^\"])*\"", Token.Type.STRING) or
-                         get_token(r"^\"(\\\"|[^\"\n])*\"", Token.Type.STRING) or
-                         get_token(r"^\r?\n", Token.Type.NEWLINE) or
-                         get_token(r"^\s+", Token.Type.WHITESPACE))
-
-                if token and token.type == Token.Type.DOCUMENTATION:
-                    if re.match(r"^\/{4,}$", token.value):
-                        token.type = Token.Type.COMMENT
+                token = (get_block_comment() or
+                         get_string())
+            elif token.type == Token.Type.DOCUMENTATION:
+                if re.match(r"^\/{4,}$", token.value):
+                    token.type = Token.Type.COMMENT
 
             if not token:
-                for k, v in DELIMITERS.items():
-                    token = get_token(r"^" + k, v)
-                    if token:
-                        break
+                delimiter = DELIMITER_CHARS.get(_code[at])
+                if delimiter:
+                    token = Token(_code[at], delimiter, at, 1)
 
             if token:
                 tokens.append(token)
-                _code = _code[token.len:]
                 at += token.len
             else:
-                raise TokenizationError()
+                raise TokenizationError(
+                    "Unexpected character {} at {}!".format(repr(_code[at]), at))
 
         tokens.append(Token("", Token.Type.EOF, at, 0))
 
         return tokens
+
+
+CHUNK_SIZE = 1024 * 1024
+""" Approximate number of characters in chunks of code tokenized in parallel. """
+
+REGEX_SPLIT_SCAN = re.compile(r"/\*|//|@\"|\"")
+""" Starts of block comments, comments and strings, within which code can not
+be split. """
+
+REGEX_SPLIT_SCAN_NEWLINE = re.compile(r"/\*|//|@\"|\"|\n")
+
+
+def find_split_points(_code: str, _chunk_size: int = CHUNK_SIZE):
+    """ Returns a sorted list of positions, at least `_chunk_size` characters
+    apart, at which the code can be split into chunks that tokenize into the
+    same tokens as the whole code. These are starts of lines which are not
+    inside of a block comment or a string and which do not start with a
+    whitespace (that would be a part of a whitespace token spanning over the
+    previous line). """
+    points = []
+    at = 0
+    size = len(_code)
+    nxt = _chunk_size
+
+    while at < size:
+        regex = REGEX_SPLIT_SCAN_NEWLINE if at >= nxt else REGEX_SPLIT_SCAN
+        m = regex.search(_code, at)
+        if not m:
+            if regex is REGEX_SPLIT_SCAN and nxt < size:
+                at = nxt
+                continue
+            break
+
+        # Do not look for newlines too early
+        if regex is REGEX_SPLIT_SCAN and m.start(0) > nxt:
+            at = nxt
+            continue
+
+        found = m.group(0)
+        at = m.end(0)
+
+        if found == "\n":
+            if at < size and not _code[at].isspace():
+                points.append(at)
+                nxt = at + _chunk_size
+        elif found == "/*":
+            end = _code.find("*/", at)
+            at = size if end == -1 else end + 2
+        elif found == "//":
+            end = _code.find("\n", at)
+            at = size if end == -1 else end
+        elif found == "@\"":
+            end = _code.find("\"", at)
+            if end == -1:
+                break
+            at = end + 1
+        else:
+            # Same as in Tokenizer.tokenize
+            while True:
+                m = REGEX_STRING_END.search(_code, at)
+                if not m or m.group(0) == "\n":
+                    return points
+                if m.group(0) == "\\":
+                    at = m.end(0) + 1
+                    continue
+                at = m.end(0)
+                break
+
+    return points
+
+
+def _tokenize_chunk(_chunk: str):
+    # Tokens cover the code without gaps and their values are slices of it,
+    # so only their types and lengths are sent back
+    tokens = Tokenizer().tokenize(_chunk)
+    return bytes(t.type.value for t in tokens), array("L", (t.len for t in tokens))
+
+
+def tokenize_parallel(_code: str, _jobs: int = None, _chunk_size: int = CHUNK_SIZE):
+    """ Tokenizes code split at `find_split_points` on a pool of `_jobs`
+    processes (defaults to the number of CPUs). Returns the same tokens as
+    `Tokenizer.tokenize` and raises the same errors. """
+    from concurrent.futures import ProcessPoolExecutor
+
+    jobs = _jobs or os.cpu_count() or 1
+    points = find_split_points(_code, _chunk_size) if jobs > 1 else []
+    if not points:
+        return Tokenizer().tokenize(_code)
+
+    bounds = [0] + points + [len(_code)]
+    chunks = [_code[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+
+    try:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(chunks))) as executor:
+            results = list(executor.map(_tokenize_chunk, chunks))
+    except TokenizationError:
+        # Raise the error with a position within the whole code
+        return Tokenizer().tokenize(_code)
+
+    types = {t.value: t for t in Token.Type}
+    tokens = []
+    for offset, (chunk_types, chunk_lens) in zip(bounds, results):
+        # Chunks end with an EOF token, only the last one is kept
+        if tokens:
+            tokens.pop()
+        at = offset
+        for t, l in zip(chunk_types, chunk_lens):
+            tokens.append(Token(_code[at:at + l], types[t], at, l))
+            at += l
+
+    return tokens
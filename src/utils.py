@@ -37,3 +37,16 @@ def merge(source, destination):
                 destination[key] = []
             destination[key].append(i)
     return destination
+
+
+def get_lines(code, offsets):
+    """ Returns a list of line numbers (starting at 1) of character offsets
+    into `code`, in the order of `offsets`. """
+    lines = [0] * len(offsets)
+    line = 1
+    last = 0
+    for i in sorted(range(len(offsets)), key=lambda i: offsets[i]):
+        line += code.count("\n", last, offsets[i])
+        last = offsets[i]
+        lines[i] = line
+    return lines
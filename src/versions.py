@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import os
+import re
+import shutil
+
+
+STORE_DIR = ".store"
+""" Name of the content-addressed store directory within the root of
+versioned documentation. """
+
+VERSIONS_FILE = "versions.json"
+""" Name of the file listing all published versions. """
+
+MANIFEST_FILE = "manifest.json"
+""" Name of the file within the store which lists objects used by each
+version. """
+
+INDEX = """<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="utf-8">
+  <meta http-equiv="refresh" content="0; url={version}/index.html">
+  <title>Redirecting</title>
+</head>
+<body>
+  <a href="{version}/index.html">{version}</a>
+</body>
+</html>
+"""
+""" Root index page redirecting to the latest version. """
+
+
+def version_key(version):
+    """ Returns a key for natural sorting of version names, so that "1.10.0"
+    is greater than "1.9.0". """
+    return [(0, int(p), "") if p.isdigit() else (1, 0, p)
+            for p in re.findall(r"\d+|[^\d.]+", version)]
+
+
+def check_version(version):
+    """ Raises an exception if `version` can not be used as a name of a
+    directory within the root of versioned documentation. """
+    # Names starting with a dot are reserved for the store and staging
+    if (not version or "/" in version or "\\" in version or ".." in version
+            or version.startswith(".") or os.path.splitdrive(version)[0]):
+        raise Exception("Invalid version name {}!".format(version))
+
+
+def hash_file(fpath):
+    h = hashlib.sha256()
+    with open(fpath, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _link(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def load_versions(root):
+    fpath = os.path.join(root, VERSIONS_FILE)
+    if not os.path.exists(fpath):
+        return []
+    with open(fpath, "r") as f:
+        return json.load(f).get("versions", [])
+
+
+def _load_manifest(root, versions):
+    """ Returns a dictionary of published versions to lists of digests of
+    objects they use. Versions published before the manifest existed are
+    hashed again. """
+    fpath = os.path.join(root, STORE_DIR, MANIFEST_FILE)
+    manifest = {}
+    if os.path.exists(fpath):
+        with open(fpath, "r") as f:
+            manifest = json.load(f).get("versions", {})
+
+    for version in versions:
+        version_dir = os.path.join(root, version)
+        if version not in manifest and os.path.isdir(version_dir):
+            digests = set()
+            for dirpath, _, files in os.walk(version_dir):
+                for file in files:
+                    digests.add(hash_file(os.path.join(dirpath, file)))
+            manifest[version] = sorted(digests)
+
+    return {v: d for v, d in manifest.items() if os.path.isdir(os.path.join(root, v))}
+
+
+def _save_manifest(root, manifest):
+    fpath = os.path.join(root, STORE_DIR, MANIFEST_FILE)
+    os.makedirs(os.path.dirname(fpath), exist_ok=True)
+    with open(fpath + ".tmp", "w") as f:
+        json.dump({"versions": manifest}, f)
+    os.replace(fpath + ".tmp", fpath)
+
+
+def publish(staging_dir, root, version, log=print):
+    """ Moves documentation built in `staging_dir` into `root/version`.
+
+    Every file is stored only once in a content-addressed store within
+    `root` and hardlinked into the version directories, so files identical
+    across versions (template assets, unchanged pages) take up space only
+    once. Where hardlinks are not supported, files are copied instead.
+    Objects used by each version are listed in a manifest within the store
+    and objects which are not used by any version anymore are removed.
+    Returns the number of files which were already in the store.
+    """
+    check_version(version)
+    store = os.path.join(root, STORE_DIR)
+    version_dir = os.path.join(root, version)
+    new_dir = version_dir + ".new"
+    reused = 0
+    digests = set()
+
+    shutil.rmtree(new_dir, ignore_errors=True)
+
+    for src_root, _, files in os.walk(staging_dir):
+        dst_root = os.path.join(new_dir, os.path.relpath(src_root, staging_dir))
+        os.makedirs(dst_root, exist_ok=True)
+        for file in files:
+            src = os.path.join(src_root, file)
+            digest = hash_file(src)
+            digests.add(digest)
+            obj = os.path.join(store, digest[:2], digest)
+            if os.path.exists(obj):
+                reused += 1
+            else:
+                os.makedirs(os.path.dirname(obj), exist_ok=True)
+                os.replace(src, obj)
+            _link(obj, os.path.join(dst_root, file))
+
+    versions = load_versions(root)
+    manifest = _load_manifest(root, [v for v in versions if v != version])
+
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    shutil.rmtree(version_dir, ignore_errors=True)
+    os.rename(new_dir, version_dir)
+
+    manifest[version] = sorted(digests)
+    _save_manifest(root, manifest)
+
+    # Remove objects not used by any version. Link counts can not tell,
+    # since objects are copied where hardlinks are not supported.
+    used = set(d for v in manifest.values() for d in v)
+    for obj_root, dirs, files in os.walk(store):
+        if obj_root == store:
+            continue
+        for file in files:
+            if file not in used:
+                os.remove(os.path.join(obj_root, file))
+
+    if version not in versions:
+        versions.append(version)
+    versions.sort(key=version_key, reverse=True)
+
+    with open(os.path.join(root, VERSIONS_FILE), "w") as f:
+        json.dump({"latest": versions[0], "versions": versions}, f, indent=2)
+
+    with open(os.path.join(root, "index.html"), "w") as f:
+        f.write(INDEX.format(version=versions[0]))
+
+    log("Published version {} ({} files reused)".format(version, reused))
+    return reused
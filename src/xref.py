@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import sqlite3
+import tempfile
+
+
+SCHEMA_VERSION = 1
+""" Version of the database schema and of the references stored in it,
+databases of other versions are created again from scratch. """
+
+SCHEMA = """
+CREATE TABLE files (
+    file TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE refs (
+    name TEXT NOT NULL,
+    file TEXT NOT NULL,
+    caller TEXT NOT NULL
+);
+CREATE INDEX refs_name ON refs (name, file);
+CREATE INDEX refs_file ON refs (file);
+"""
+
+
+def get_default_path(project_dir, cache_dir=None):
+    """ Returns the path to the index of references of a project, which is
+    in `cache_dir` (defaults to the system's temp directory). """
+    project_dir = os.path.abspath(project_dir)
+    return os.path.join(
+        cache_dir if cache_dir else tempfile.gettempdir(),
+        "gmdoc-usages-{}.sqlite".format(hashlib.sha1(project_dir.encode("utf-8")).hexdigest()[:16]))
+
+
+class UsageIndex(object):
+    """ Inverted index of names to places where they are referenced, made
+    from `Script.references` and stored in an SQLite database at `_path`
+    (defaults to an in-memory database). Scripts are stored with their
+    size and mtime, so the index can be kept between builds and updated
+    only for modified files. Changes are written by `commit`. """
+
+    def __init__(self, _path=":memory:"):
+        self.path = _path
+        self._conn = self._connect()
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            if version:
+                # Made by another version of GMDoc, start from scratch
+                self._conn.close()
+                for suffix in ["", "-wal", "-shm"]:
+                    if os.path.exists(_path + suffix):
+                        os.remove(_path + suffix)
+                self._conn = self._connect()
+            self._conn.executescript(SCHEMA)
+            self._conn.execute("PRAGMA user_version = {}".format(SCHEMA_VERSION))
+            self._conn.commit()
+        self._files = {
+            file: (mtime_ns, size)
+            for file, mtime_ns, size in self._conn.execute("SELECT file, mtime_ns, size FROM files")
+        }
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(DISTINCT name) FROM refs").fetchone()[0]
+
+    def is_fresh(self, file, key):
+        """ Returns True if references of a script at path `file` are stored
+        for key (mtime_ns, size). """
+        return self._files.get(file) == tuple(key)
+
+    def update(self, file, key, references):
+        """ Sets references of a script at path `file` with key
+        (mtime_ns, size), replacing references it had before. """
+        if self.is_fresh(file, key):
+            return
+        self.remove(file)
+        self._files[file] = tuple(key)
+        self._conn.execute("INSERT INTO files VALUES (?, ?, ?)", (file, key[0], key[1]))
+        self._conn.executemany(
+            "INSERT INTO refs VALUES (?, ?, ?)",
+            ((name, file, caller) for name in sorted(references) for caller in references[name]))
+
+    def remove(self, file):
+        """ Removes all references of a script at path `file`. """
+        if self._files.pop(file, None) is None:
+            return
+        self._conn.execute("DELETE FROM refs WHERE file = ?", (file,))
+        self._conn.execute("DELETE FROM files WHERE file = ?", (file,))
+
+    def retain(self, files):
+        """ Removes references of all scripts not in `files`. """
+        files = set(files)
+        for file in [f for f in self._files if f not in files]:
+            self.remove(file)
+
+    @staticmethod
+    def _outside(name):
+        # Places inside of the item itself, e.g. its methods, are left out
+        return "caller != ? AND substr(caller, 1, ?) != ?", (name, len(name) + 1, name + ".")
+
+    def get(self, name, limit=None):
+        """ Returns a list of at most `limit` tuples (file, caller) of places
+        outside of item `name` where it is referenced, sorted by file.
+        Caller is a dotted name of the enclosing function or an empty string
+        outside of functions. """
+        condition, args = self._outside(name)
+        sql = "SELECT file, caller FROM refs WHERE name = ? AND " + condition + " ORDER BY file, rowid"
+        if limit is not None:
+            sql += " LIMIT {}".format(int(limit))
+        return self._conn.execute(sql, (name,) + args).fetchall()
+
+    def count(self, name):
+        """ Returns the number of places outside of item `name` where it is
+        referenced. """
+        condition, args = self._outside(name)
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM refs WHERE name = ? AND " + condition, (name,) + args).fetchone()[0]
+
+    def commit(self):
+        self._conn.commit()
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
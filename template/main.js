@@ -1,4 +1,9 @@
 $(function () {
+  const serviceWorker = $('body').attr('data-service-worker');
+  if (serviceWorker && 'serviceWorker' in navigator) {
+    navigator.serviceWorker.register(serviceWorker).catch(function () {});
+  }
+
   const active = $('#side-menu').find('a.active')[0];
   if (active) {
     active.scrollIntoView();
@@ -12,19 +17,88 @@ $(function () {
     $('#side-menu').toggle();
   });
 
-  $('#side-menu').find('i[data-target]').each(function (i, e) {
-    const self = $(e);
-    self.on('click', function () {
-      if (self.hasClass('fa-minus-square')) {
-        self.removeClass('fa-minus-square').addClass('fa-plus-square');
-      } else if (self.hasClass('fa-plus-square')) {
-        self.removeClass('fa-plus-square').addClass('fa-minus-square');
+  const versionSwitcher = $('#version-switcher');
+  if (versionSwitcher.length) {
+    const path = window.location.pathname.split('/');
+    const current = decodeURIComponent(path[path.length - 2]);
+    $.getJSON('../versions.json', function (data) {
+      versionSwitcher.empty();
+      $.each(data.versions, function (i, v) {
+        $('<option>').val(v).text(v).prop('selected', v === current)
+          .appendTo(versionSwitcher);
+      });
+    });
+    versionSwitcher.on('change', function () {
+      window.location = '../' + encodeURIComponent($(this).val()) + '/' +
+        versionSwitcher.attr('data-page');
+    });
+  }
+
+  $('#side-menu').on('click', 'i[data-target]', function () {
+    const self = $(this);
+    if (self.hasClass('fa-minus-square')) {
+      self.removeClass('fa-minus-square').addClass('fa-plus-square');
+    } else if (self.hasClass('fa-plus-square')) {
+      self.removeClass('fa-plus-square').addClass('fa-minus-square');
+    }
+    const target = $(self.attr('data-target'));
+    // Contents of collapsed folders are rendered when first expanded
+    target.children('template').each(function (i, template) {
+      template.parentNode.replaceChild(template.content, template);
+    });
+    target.toggle();
+  });
+
+  // Long tables are rendered in chunks as they are scrolled into view
+  const TABLE_ROWS_CHUNK = 100;
+  const pageWrapper = document.getElementById('page-wrapper');
+  const renderAllRows = [];
+
+  $('template.deferred-rows').each(function (i, template) {
+    function renderRows(count) {
+      const fragment = document.createDocumentFragment();
+      const rows = template.content;
+      while (rows.firstElementChild && count-- > 0) {
+        fragment.appendChild(rows.firstElementChild);
+      }
+      template.parentNode.insertBefore(fragment, template);
+      if (!rows.firstElementChild) {
+        template.remove();
+        return null;
+      }
+      return template.previousElementSibling;
+    }
+
+    if (!('IntersectionObserver' in window)) {
+      renderRows(Infinity);
+      return;
+    }
+
+    const observer = new IntersectionObserver(function (entries) {
+      if (!entries[0].isIntersecting) {
+        return;
+      }
+      observer.unobserve(entries[0].target);
+      const last = renderRows(TABLE_ROWS_CHUNK);
+      if (last) {
+        observer.observe(last);
+      }
+    }, { root: pageWrapper, rootMargin: '1000px 0px' });
+    observer.observe(template.previousElementSibling);
+
+    renderAllRows.push(function () {
+      if (template.parentNode) {
+        observer.disconnect();
+        renderRows(Infinity);
       }
-      const target = self.attr('data-target');
-      $(target).toggle();
     });
   });
 
+  // Printed pages need all rows
+  $(window).on('beforeprint', function () {
+    renderAllRows.forEach(function (render) { render(); });
+  });
+
   $('[data-like]').on('click', function () {
     $('input[name="like"]').val(parseInt($(this).attr('data-like')));
   });
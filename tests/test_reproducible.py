@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+""" Rebuilding an unchanged project must give byte-identical output. """
+import os
+import sys
+import tarfile
+import zipfile
+
+import pytest
+
+GMDOC_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")
+
+sys.path.insert(0, GMDOC_DIR)
+sys.path.insert(0, os.path.join(GMDOC_DIR, "benchmarks"))
+
+from generate_project import generate
+from src.builder import Builder
+from src.output import ArchiveOutput, MemoryOutput
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.delenv("SOURCE_DATE_EPOCH", raising=False)
+    project_dir = str(tmp_path / "project")
+    generate(project_dir, scripts=10, constructors=3, enums=2, members=4)
+    return project_dir
+
+
+def _build(project_dir, output, cache_dir):
+    # A new Builder each time, so nothing is reused from the previous build
+    return Builder(log=None, cache_dir=cache_dir).build(project_dir, options={"output": output})
+
+
+def _read_tree(root):
+    files = {}
+    for dirpath, _, fnames in os.walk(root):
+        for fname in fnames:
+            fpath = os.path.join(dirpath, fname)
+            with open(fpath, "rb") as f:
+                files[os.path.relpath(fpath, root)] = f.read()
+    return files
+
+
+def test_directory_output(project, tmp_path):
+    trees = []
+    for i in range(2):
+        out_dir = str(tmp_path / "docs{}".format(i))
+        Builder(log=None, cache_dir=str(tmp_path / "cache")).build(project, out_dir)
+        trees.append(_read_tree(out_dir))
+    assert "index.html" in trees[0]
+    assert trees[0] == trees[1]
+
+
+def test_memory_output(project, tmp_path):
+    first = _build(project, MemoryOutput(), str(tmp_path / "cache")).output.files
+    second = _build(project, MemoryOutput(), str(tmp_path / "cache")).output.files
+    assert "index.html" in first
+    assert not [name for name in first if name.endswith(".md")]
+    assert first == second
+
+
+@pytest.mark.parametrize("ext", [".zip", ".tar.gz"])
+def test_archive_output(project, tmp_path, ext):
+    contents = []
+    for i in range(2):
+        fpath = str(tmp_path / "docs{}{}".format(i, ext))
+        _build(project, ArchiveOutput(fpath), str(tmp_path / "cache"))
+        with open(fpath, "rb") as f:
+            contents.append(f.read())
+    assert contents[0] == contents[1]
+
+    # Generated Markdown is not a part of the documentation
+    if ext == ".zip":
+        with zipfile.ZipFile(fpath) as f:
+            names = f.namelist()
+    else:
+        with tarfile.open(fpath) as f:
+            names = f.getnames()
+    assert "index.html" in names
+    assert not [name for name in names if name.endswith(".md")]
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+""" Streaming builds must give the same documentation as regular builds. """
+import os
+import sys
+
+import pytest
+
+GMDOC_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")
+
+sys.path.insert(0, GMDOC_DIR)
+sys.path.insert(0, os.path.join(GMDOC_DIR, "benchmarks"))
+
+from generate_project import generate
+from src.builder import Builder
+
+
+DUPLICATES = """
+/// @func GMD_func_0()
+/// @desc Defined again in another script.
+function GMD_func_0() {
+}
+
+/// @func GMD_Struct0()
+/// @desc Defined again in another script.
+function GMD_Struct0() constructor {
+    /// @var {real} The only member.
+    x = 1;
+}
+"""
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.delenv("SOURCE_DATE_EPOCH", raising=False)
+    project_dir = str(tmp_path / "project")
+    generate(project_dir, scripts=4, constructors=2, enums=1, members=4, density=1.0)
+    return project_dir
+
+
+def _read_tree(root):
+    files = {}
+    for dirpath, _, fnames in os.walk(root):
+        for fname in fnames:
+            fpath = os.path.join(dirpath, fname)
+            with open(fpath, "rb") as f:
+                files[os.path.relpath(fpath, root)] = f.read()
+    return files
+
+
+def _build(project_dir, out_dir, cache_dir, streaming):
+    Builder(log=None, cache_dir=cache_dir).build(
+        project_dir, out_dir, options={"streaming": streaming})
+    return _read_tree(out_dir)
+
+
+def test_duplicate_names(project, tmp_path):
+    # Items with the same name in different scripts, the last one wins
+    with open(os.path.join(project, "scripts", "GMD_func_1", "GMD_func_1.gml"), "a") as f:
+        f.write(DUPLICATES)
+    cache_dir = str(tmp_path / "cache")
+    regular = _build(project, str(tmp_path / "regular"), cache_dir, False)
+    streamed = _build(project, str(tmp_path / "streamed"), cache_dir, True)
+    assert "GMD_Struct0.x.html" in streamed
+    assert "GMD_Struct0.method0.html" not in streamed
+    assert regular == streamed
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+""" Parallel tokenization must give the same tokens as the serial one. """
+import os
+import sys
+
+import pytest
+
+GMDOC_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")
+
+sys.path.insert(0, GMDOC_DIR)
+
+from src.tokenizer import Tokenizer, TokenizationError, find_split_points, tokenize_parallel
+
+
+CODE = "\n".join([
+    "/// @func foo(_a)",
+    "/// @desc Does things.",
+    "function foo(_a) {",
+    "    /* A block comment",
+    "var not_code = 1;",
+    "       spanning lines */",
+    "    var _s = \"escaped \\\" quote\\\\\";",
+    "    var _v = @\"verbatim",
+    "function not_a_function() {",
+    "\\ no escapes in verbatim strings\";",
+    "    return _a + $ff + .5; // Comment \"",
+    "}",
+    "",
+    "#macro BAR 10",
+    "/* Unterminated at the end of a chunk? */var _x = BAR;",
+    "\tindented = 1;",
+    "enum E { A, B = 2 }",
+]) + "\n"
+
+# Without strings, so wrong splits can not fall back to serial tokenization
+COMMENTS = "\n".join([
+    "a = 1; /* A block comment",
+    "b = 2;",
+    "",
+    "  c = 3; */ d = 4;",
+    "/*/ e = 5;",
+    "*/ f = 6; // /*",
+    "g = 7;",
+]) + "\n"
+
+CASES = {
+    "lf": CODE * 3,
+    "crlf": (CODE * 3).replace("\n", "\r\n"),
+    "no_newline_at_end": (CODE * 3).rstrip("\n"),
+    "comments": COMMENTS * 3,
+    "comments_crlf": (COMMENTS * 3).replace("\n", "\r\n"),
+}
+
+
+def _tokens(tokens):
+    return [(t.type, t.value, t.at, t.len) for t in tokens]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 17, 60])
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_same_tokens(case, chunk_size):
+    code = CASES[case]
+    assert find_split_points(code, chunk_size)
+    expected = _tokens(Tokenizer().tokenize(code))
+    assert _tokens(tokenize_parallel(code, _jobs=2, _chunk_size=chunk_size)) == expected
+
+
+@pytest.mark.parametrize("code", [
+    CODE + "var _s = \"unterminated\n" + CODE,
+    CODE * 2 + "var _s = @\"unterminated verbatim\n\nx = 1;\n",
+])
+def test_same_errors(code):
+    with pytest.raises(TokenizationError) as expected:
+        Tokenizer().tokenize(code)
+    with pytest.raises(TokenizationError) as error:
+        tokenize_parallel(code, _jobs=2, _chunk_size=17)
+    assert str(error.value) == str(expected.value)